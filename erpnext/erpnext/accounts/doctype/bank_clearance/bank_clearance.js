@@ -3,6 +3,7 @@
 
 frappe.ui.form.on("Bank Clearance", {
 	setup: function(frm) {
+		frm.page_length = 500;
 		frm.add_fetch("account", "account_currency", "account_currency");
 
 		frm.set_query("account", function() {
@@ -48,9 +49,14 @@ frappe.ui.form.on("Bank Clearance", {
 		return frappe.call({
 			method: "update_clearance_date",
 			doc: frm.doc,
+			args: {
+				page_length: frm.page_length,
+			},
 			callback: function(r, rt) {
 				frm.refresh_field("payment_entries");
 				frm.refresh_fields();
+				// the list is reloaded from the first page
+				frm.events.toggle_load_more(frm, frm.doc.payment_entries.length);
 
 				if (!frm.doc.payment_entries.length) {
 					frm.change_custom_button_type(__('Get Payment Entries'), null, 'primary');
@@ -64,8 +70,13 @@ frappe.ui.form.on("Bank Clearance", {
 		return frappe.call({
 			method: "get_payment_entries",
 			doc: frm.doc,
+			args: {
+				start: 0,
+				page_length: frm.page_length,
+			},
 			callback: function(r, rt) {
 				frm.refresh_field("payment_entries");
+				frm.events.toggle_load_more(frm, frm.doc.payment_entries.length);
 
 				if (frm.doc.payment_entries.length) {
 					frm.add_custom_button(__('Update Clearance Date'), () =>
@@ -77,5 +88,32 @@ frappe.ui.form.on("Bank Clearance", {
 				}
 			}
 		});
+	},
+
+	load_more_payment_entries: function(frm) {
+		let start = frm.doc.payment_entries.length;
+
+		return frappe.call({
+			method: "get_payment_entries",
+			doc: frm.doc,
+			args: {
+				start: start,
+				page_length: frm.page_length,
+			},
+			callback: function(r, rt) {
+				frm.refresh_field("payment_entries");
+				frm.events.toggle_load_more(frm, frm.doc.payment_entries.length - start);
+			}
+		});
+	},
+
+	toggle_load_more: function(frm, fetched) {
+		frm.remove_custom_button(__('Load More'));
+
+		if (fetched >= frm.page_length) {
+			frm.add_custom_button(__('Load More'), () =>
+				frm.trigger("load_more_payment_entries")
+			);
+		}
 	}
 });
@@ -1,31 +1,41 @@
 # Copyright (c) 2015, Frappe Technologies Pvt. Ltd. and Contributors
 # License: GNU General Public License v3. See license.txt
 
+from collections import defaultdict
 
 import frappe
 from frappe import _, msgprint
 from frappe.model.document import Document
-from frappe.utils import flt, fmt_money, getdate
+from frappe.query_builder.custom import ConstantColumn
+from frappe.query_builder.functions import IfNull, Sum
+from frappe.query_builder.terms import ParameterizedValueWrapper
+from frappe.utils import cint, flt, fmt_money, getdate
+from pypika.terms import NullValue
 
 import erpnext
 
 form_grid_templates = {"journal_entries": "templates/form_grid/bank_reconciliation_grid.html"}
 
+BANK_CLEARANCE_CACHE_PREFIX = "erpnext:bank_clearance:"
+
 
 class BankClearance(Document):
 	@frappe.whitelist()
-	def get_payment_entries(self):
+	def get_payment_entries(self, start=0, page_length=0):
 		if not (self.from_date and self.to_date):
 			frappe.throw(_("From Date and To Date are Mandatory"))
 
 		if not self.account:
 			frappe.throw(_("Account is mandatory to get payment entries"))
 
-		entries = []
+		start, page_length = cint(start), cint(page_length)
+		# the page is cut from the merged entries, so each app returns all rows up to its end
+		paging = {"start": 0, "page_length": start + page_length} if page_length else {}
+		entries_by_app = []
 
 		# get entries from all the apps
 		for method_name in frappe.get_hooks("get_payment_entries_for_bank_clearance"):
-			entries += (
+			entries_by_app.append(
 				frappe.get_attr(method_name)(
 					self.from_date,
 					self.to_date,
@@ -33,38 +43,46 @@ class BankClearance(Document):
 					self.bank_account,
 					self.include_reconciled_entries,
 					self.include_pos_transactions,
+					**paging,
 				)
 				or []
 			)
 
+		# other apps may return unsorted rows or posting dates as strings
 		entries = sorted(
-			entries,
+			(d for entries in entries_by_app for d in entries),
 			key=lambda k: getdate(k["posting_date"]),
 		)
+		if page_length:
+			entries = entries[start : start + page_length]
+
+		if not start:
+			self.set("payment_entries", [])
+
+		self.extend("payment_entries", self.format_payment_entries(entries))
 
-		self.set("payment_entries", [])
+	def format_payment_entries(self, entries):
+		"""Yield clearance rows one at a time so no intermediate list is built."""
 		default_currency = erpnext.get_default_currency()
+		debit_label, credit_label = _("Dr"), _("Cr")
 
 		for d in entries:
-			row = self.append("payment_entries", {})
+			amount = flt(d.pop("debit", 0)) - flt(d.pop("credit", 0))
+			account_currency = d.pop("account_currency", None) or default_currency
 
-			amount = flt(d.get("debit", 0)) - flt(d.get("credit", 0))
+			formatted_amount = fmt_money(abs(amount), 2, account_currency)
+			d.amount = formatted_amount + " " + (debit_label if amount > 0 else credit_label)
 
-			if not d.get("account_currency"):
-				d.account_currency = default_currency
+			# rows from SQL already carry a date, only parse what other apps send as strings
+			if isinstance(d.posting_date, str):
+				d.posting_date = getdate(d.posting_date)
 
-			formatted_amount = fmt_money(abs(amount), 2, d.account_currency)
-			d.amount = formatted_amount + " " + (_("Dr") if amount > 0 else _("Cr"))
-			d.posting_date = getdate(d.posting_date)
-
-			d.pop("credit")
-			d.pop("debit")
-			d.pop("account_currency")
-			row.update(d)
+			yield d
 
 	@frappe.whitelist()
-	def update_clearance_date(self):
+	def update_clearance_date(self, page_length=0):
 		clearance_date_updated = False
+		payments_by_clearance_date = defaultdict(list)
 		for d in self.get("payment_entries"):
 			if d.clearance_date:
 				if not d.payment_document:
@@ -81,121 +99,222 @@ class BankClearance(Document):
 				if not d.clearance_date:
 					d.clearance_date = None
 
-				payment_entry = frappe.get_doc(d.payment_document, d.payment_entry)
-				payment_entry.db_set("clearance_date", d.clearance_date)
-
+				payments_by_clearance_date[(d.payment_document, d.clearance_date)].append(d.payment_entry)
 				clearance_date_updated = True
 
+		for (payment_document, clearance_date), payment_entries in payments_by_clearance_date.items():
+			frappe.db.set_value(
+				payment_document, {"name": ("in", payment_entries)}, "clearance_date", clearance_date
+			)
+
 		if clearance_date_updated:
-			self.get_payment_entries()
+			clear_bank_clearance_cache()
+			self.get_payment_entries(page_length=page_length)
 			msgprint(_("Clearance Date updated"))
 		else:
 			msgprint(_("Clearance Date not mentioned"))
 
 
 def get_payment_entries_for_bank_clearance(
-	from_date, to_date, account, bank_account, include_reconciled_entries, include_pos_transactions
+	from_date,
+	to_date,
+	account,
+	bank_account,
+	include_reconciled_entries,
+	include_pos_transactions,
+	start=0,
+	page_length=0,
+):
+	cache_key = "{0}{1}:{2}:{3}:{4}:{5}:{6}:{7}:{8}".format(
+		BANK_CLEARANCE_CACHE_PREFIX,
+		account,
+		getdate(from_date),
+		getdate(to_date),
+		bank_account or "",
+		cint(include_reconciled_entries),
+		cint(include_pos_transactions),
+		cint(start),
+		cint(page_length),
+	)
+
+	entries = frappe.cache().get_value(cache_key, expires=True)
+	if entries is None:
+		entries = _get_payment_entries_for_bank_clearance(
+			from_date,
+			to_date,
+			account,
+			bank_account,
+			include_reconciled_entries,
+			include_pos_transactions,
+			start,
+			page_length,
+		)
+		frappe.cache().set_value(cache_key, entries, expires_in_sec=120)
+
+	return entries
+
+
+def clear_bank_clearance_cache():
+	"""Drops cached entries of all accounts, a voucher is listed under each account it touches"""
+	frappe.cache().delete_keys(BANK_CLEARANCE_CACHE_PREFIX)
+
+
+def clear_bank_clearance_cache_on_change(doc, method=None):
+	# submitting or cancelling a payment changes which entries are listed for its bank accounts
+	clear_bank_clearance_cache()
+
+
+def _get_payment_entries_for_bank_clearance(
+	from_date,
+	to_date,
+	account,
+	bank_account,
+	include_reconciled_entries,
+	include_pos_transactions,
+	start=0,
+	page_length=0,
 ):
-	entries = []
+	payment_entry = frappe.qb.DocType("Payment Entry")
+	journal_entry = frappe.qb.DocType("Journal Entry")
+	journal_entry_account = frappe.qb.DocType("Journal Entry Account")
+
+	def is_unreconciled(table):
+		return table.clearance_date.isnull() | (table.clearance_date == "0000-00-00")
 
-	condition = ""
+	pe_condition = (payment_entry.docstatus == 1) & (
+		payment_entry.posting_date[getdate(from_date) : getdate(to_date)]
+	)
 	if not include_reconciled_entries:
-		condition = "and (clearance_date IS NULL or clearance_date='0000-00-00')"
-
-	journal_entries = frappe.db.sql(
-		"""
-			select
-				"Journal Entry" as payment_document, t1.name as payment_entry,
-				t1.cheque_no as cheque_number, t1.cheque_date,
-				sum(t2.debit_in_account_currency) as debit, sum(t2.credit_in_account_currency) as credit,
-				t1.posting_date, t2.against_account, t1.clearance_date, t2.account_currency
-			from
-				`tabJournal Entry` t1, `tabJournal Entry Account` t2
-			where
-				t2.parent = t1.name and t2.account = %(account)s and t1.docstatus=1
-				and t1.posting_date >= %(from)s and t1.posting_date <= %(to)s
-				and ifnull(t1.is_opening, 'No') = 'No' {condition}
-			group by t2.account, t1.name
-			order by t1.posting_date ASC, t1.name DESC
-		""".format(
-			condition=condition
-		),
-		{"account": account, "from": from_date, "to": to_date},
-		as_dict=1,
+		pe_condition &= is_unreconciled(payment_entry)
+	if bank_account:
+		pe_condition &= payment_entry.bank_account == bank_account
+
+	payments_made = (
+		frappe.qb.from_(payment_entry)
+		.select(
+			ConstantColumn("Payment Entry").as_("payment_document"),
+			payment_entry.name.as_("payment_entry"),
+			payment_entry.reference_no.as_("cheque_number"),
+			payment_entry.reference_date.as_("cheque_date"),
+			ParameterizedValueWrapper(0).as_("debit"),
+			(payment_entry.paid_amount + payment_entry.total_taxes_and_charges).as_("credit"),
+			payment_entry.posting_date,
+			IfNull(payment_entry.party, payment_entry.paid_to).as_("against_account"),
+			payment_entry.clearance_date,
+			payment_entry.paid_from_account_currency.as_("account_currency"),
+		)
+		.where((payment_entry.paid_from == account) & pe_condition)
 	)
 
-	if bank_account:
-		condition += "and bank_account = %(bank_account)s"
-
-	payment_entries = frappe.db.sql(
-		"""
-			select
-				"Payment Entry" as payment_document, name as payment_entry,
-				reference_no as cheque_number, reference_date as cheque_date,
-				if(paid_from=%(account)s, paid_amount + total_taxes_and_charges, 0) as credit,
-				if(paid_from=%(account)s, 0, received_amount) as debit,
-				posting_date, ifnull(party,if(paid_from=%(account)s,paid_to,paid_from)) as against_account, clearance_date,
-				if(paid_to=%(account)s, paid_to_account_currency, paid_from_account_currency) as account_currency
-			from `tabPayment Entry`
-			where
-				(paid_from=%(account)s or paid_to=%(account)s) and docstatus=1
-				and posting_date >= %(from)s and posting_date <= %(to)s
-				{condition}
-			order by
-				posting_date ASC, name DESC
-		""".format(
-			condition=condition
-		),
-		{
-			"account": account,
-			"from": from_date,
-			"to": to_date,
-			"bank_account": bank_account,
-		},
-		as_dict=1,
+	payments_received = (
+		frappe.qb.from_(payment_entry)
+		.select(
+			ConstantColumn("Payment Entry").as_("payment_document"),
+			payment_entry.name.as_("payment_entry"),
+			payment_entry.reference_no.as_("cheque_number"),
+			payment_entry.reference_date.as_("cheque_date"),
+			payment_entry.received_amount.as_("debit"),
+			ParameterizedValueWrapper(0).as_("credit"),
+			payment_entry.posting_date,
+			IfNull(payment_entry.party, payment_entry.paid_from).as_("against_account"),
+			payment_entry.clearance_date,
+			payment_entry.paid_to_account_currency.as_("account_currency"),
+		)
+		.where(
+			(payment_entry.paid_to == account) & (payment_entry.paid_from != account) & pe_condition
+		)
+	)
+
+	journal_entries = (
+		frappe.qb.from_(journal_entry_account)
+		.inner_join(journal_entry)
+		.on(
+			(journal_entry.name == journal_entry_account.parent)
+			& (journal_entry.docstatus == 1)
+			& (journal_entry.posting_date[getdate(from_date) : getdate(to_date)])
+			& (IfNull(journal_entry.is_opening, "No") == "No")
+		)
+		.select(
+			ConstantColumn("Journal Entry").as_("payment_document"),
+			journal_entry.name.as_("payment_entry"),
+			journal_entry.cheque_no.as_("cheque_number"),
+			journal_entry.cheque_date,
+			Sum(journal_entry_account.debit_in_account_currency).as_("debit"),
+			Sum(journal_entry_account.credit_in_account_currency).as_("credit"),
+			journal_entry.posting_date,
+			journal_entry_account.against_account,
+			journal_entry.clearance_date,
+			journal_entry_account.account_currency,
+		)
+		.where(journal_entry_account.account == account)
+		.groupby(journal_entry.name)
 	)
+	if not include_reconciled_entries:
+		journal_entries = journal_entries.where(is_unreconciled(journal_entry))
+
+	entries = payments_made.union_all(payments_received).union_all(journal_entries)
 
-	pos_sales_invoices, pos_purchase_invoices = [], []
 	if include_pos_transactions:
-		pos_sales_invoices = frappe.db.sql(
-			"""
-				select
-					"Sales Invoice Payment" as payment_document, sip.name as payment_entry, sip.amount as debit,
-					si.posting_date, si.customer as against_account, sip.clearance_date,
-					account.account_currency, 0 as credit
-				from `tabSales Invoice Payment` sip, `tabSales Invoice` si, `tabAccount` account
-				where
-					sip.account=%(account)s and si.docstatus=1 and sip.parent = si.name
-					and account.name = sip.account and si.posting_date >= %(from)s and si.posting_date <= %(to)s
-				order by
-					si.posting_date ASC, si.name DESC
-			""",
-			{"account": account, "from": from_date, "to": to_date},
-			as_dict=1,
+		sales_invoice = frappe.qb.DocType("Sales Invoice")
+		sales_invoice_payment = frappe.qb.DocType("Sales Invoice Payment")
+		purchase_invoice = frappe.qb.DocType("Purchase Invoice")
+		account_currency = ParameterizedValueWrapper(
+			frappe.get_cached_value("Account", account, "account_currency")
+		)
+
+		pos_sales_invoices = (
+			frappe.qb.from_(sales_invoice_payment)
+			.inner_join(sales_invoice)
+			.on(sales_invoice.name == sales_invoice_payment.parent)
+			.select(
+				ConstantColumn("Sales Invoice Payment").as_("payment_document"),
+				sales_invoice_payment.name.as_("payment_entry"),
+				NullValue().as_("cheque_number"),
+				NullValue().as_("cheque_date"),
+				sales_invoice_payment.amount.as_("debit"),
+				ParameterizedValueWrapper(0).as_("credit"),
+				sales_invoice.posting_date,
+				sales_invoice.customer.as_("against_account"),
+				sales_invoice_payment.clearance_date,
+				account_currency.as_("account_currency"),
+			)
+			.where(
+				(sales_invoice_payment.account == account)
+				& (sales_invoice.docstatus == 1)
+				& (sales_invoice.posting_date[getdate(from_date) : getdate(to_date)])
+			)
 		)
 
-		pos_purchase_invoices = frappe.db.sql(
-			"""
-				select
-					"Purchase Invoice" as payment_document, pi.name as payment_entry, pi.paid_amount as credit,
-					pi.posting_date, pi.supplier as against_account, pi.clearance_date,
-					account.account_currency, 0 as debit
-				from `tabPurchase Invoice` pi, `tabAccount` account
-				where
-					pi.cash_bank_account=%(account)s and pi.docstatus=1 and account.name = pi.cash_bank_account
-					and pi.posting_date >= %(from)s and pi.posting_date <= %(to)s
-				order by
-					pi.posting_date ASC, pi.name DESC
-			""",
-			{"account": account, "from": from_date, "to": to_date},
-			as_dict=1,
+		pos_purchase_invoices = (
+			frappe.qb.from_(purchase_invoice)
+			.select(
+				ConstantColumn("Purchase Invoice").as_("payment_document"),
+				purchase_invoice.name.as_("payment_entry"),
+				NullValue().as_("cheque_number"),
+				NullValue().as_("cheque_date"),
+				ParameterizedValueWrapper(0).as_("debit"),
+				purchase_invoice.paid_amount.as_("credit"),
+				purchase_invoice.posting_date,
+				purchase_invoice.supplier.as_("against_account"),
+				purchase_invoice.clearance_date,
+				account_currency.as_("account_currency"),
+			)
+			.where(
+				(purchase_invoice.cash_bank_account == account)
+				& (purchase_invoice.docstatus == 1)
+				& (purchase_invoice.posting_date[getdate(from_date) : getdate(to_date)])
+			)
 		)
 
-	entries = (
-		list(payment_entries)
-		+ list(journal_entries)
-		+ list(pos_sales_invoices)
-		+ list(pos_purchase_invoices)
+		entries = entries.union_all(pos_sales_invoices).union_all(pos_purchase_invoices)
+
+	query = (
+		frappe.qb.from_(entries)
+		.select("*")
+		.orderby("posting_date")
+		.orderby("payment_entry", order=frappe.qb.desc)
 	)
+	if cint(page_length):
+		query = query.limit(cint(page_length)).offset(cint(start))
 
-	return entries
+	return query.run(as_dict=True)
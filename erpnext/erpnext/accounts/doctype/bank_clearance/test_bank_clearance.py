@@ -4,8 +4,10 @@
 import unittest
 
 import frappe
+from frappe.tests.utils import patch_hooks
 from frappe.utils import add_months, getdate
 
+from erpnext.accounts.doctype.bank_clearance.bank_clearance import clear_bank_clearance_cache
 from erpnext.accounts.doctype.payment_entry.test_payment_entry import get_payment_entry
 from erpnext.accounts.doctype.purchase_invoice.test_purchase_invoice import make_purchase_invoice
 from erpnext.tests.utils import if_lending_app_installed, if_lending_app_not_installed
@@ -30,6 +32,45 @@ class TestBankClearance(unittest.TestCase):
 		bank_clearance.get_payment_entries()
 		self.assertEqual(len(bank_clearance.payment_entries), 1)
 
+	def test_paging_over_entries_from_multiple_apps(self):
+		bank_clearance = frappe.get_doc("Bank Clearance")
+		bank_clearance.account = "_Test Bank Clearance - _TC"
+		bank_clearance.from_date = "2023-01-01"
+		bank_clearance.to_date = "2023-01-31"
+
+		hook_path = "erpnext.accounts.doctype.bank_clearance.test_bank_clearance"
+		hooks = {
+			"get_payment_entries_for_bank_clearance": [
+				f"{hook_path}.get_odd_day_entries",
+				f"{hook_path}.get_even_day_entries",
+			]
+		}
+
+		with patch_hooks(hooks):
+			pages = []
+			for start in (0, 2, 4, 6):
+				bank_clearance.get_payment_entries(start=start, page_length=2)
+				pages.append([d.payment_entry for d in bank_clearance.payment_entries[start:]])
+
+		self.assertEqual(pages, [["_T-1", "_T-2"], ["_T-3", "_T-4"], ["_T-5", "_T-6"], []])
+
+	def test_cleared_entry_is_not_listed_again(self):
+		bank_clearance = frappe.get_doc("Bank Clearance")
+		bank_clearance.account = "_Test Bank Clearance - _TC"
+		bank_clearance.from_date = add_months(getdate(), -1)
+		bank_clearance.to_date = getdate()
+		bank_clearance.get_payment_entries()
+
+		row = next(d for d in bank_clearance.payment_entries if d.payment_document == "Payment Entry")
+		self.addCleanup(reset_clearance_date, row.payment_document, row.payment_entry)
+
+		row.clearance_date = getdate()
+		bank_clearance.update_clearance_date()
+
+		# listed again right away, the cached entries must not bring the cleared payment back
+		bank_clearance.get_payment_entries()
+		self.assertNotIn(row.payment_entry, [d.payment_entry for d in bank_clearance.payment_entries])
+
 	@if_lending_app_installed
 	def test_bank_clearance_with_loan(self):
 		from lending.loan_management.doctype.loan.test_loan import (
@@ -86,6 +127,37 @@ class TestBankClearance(unittest.TestCase):
 		self.assertEqual(len(bank_clearance.payment_entries), 3)
 
 
+def get_odd_day_entries(*args, start=0, page_length=0):
+	return get_test_entries([1, 3, 5], start, page_length)
+
+
+def get_even_day_entries(*args, start=0, page_length=0):
+	# other apps may send posting dates as strings
+	return [
+		d.update(posting_date=str(d.posting_date))
+		for d in get_test_entries([2, 4, 6], start, page_length)
+	]
+
+
+def get_test_entries(days, start, page_length):
+	entries = [
+		frappe._dict(
+			payment_document="Payment Entry",
+			payment_entry=f"_T-{day}",
+			posting_date=getdate(f"2023-01-0{day}"),
+			debit=100,
+			credit=0,
+		)
+		for day in days
+	]
+	return entries[start : start + page_length] if page_length else entries
+
+
+def reset_clearance_date(doctype, name):
+	frappe.db.set_value(doctype, name, "clearance_date", None)
+	clear_bank_clearance_cache()
+
+
 def clear_payment_entries():
 	frappe.db.delete("Payment Entry")
 
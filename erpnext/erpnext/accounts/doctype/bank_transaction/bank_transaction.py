@@ -4,6 +4,7 @@
 import frappe
 from frappe.utils import flt
 
+from erpnext.accounts.doctype.bank_clearance.bank_clearance import clear_bank_clearance_cache
 from erpnext.controllers.status_updater import StatusUpdater
 
 
@@ -350,6 +351,7 @@ def set_voucher_clearance(doctype, docname, clearance_date, self):
 		):
 			return
 		frappe.db.set_value(doctype, docname, "clearance_date", clearance_date)
+		clear_bank_clearance_cache()
 
 	elif doctype == "Sales Invoice":
 		frappe.db.set_value(
@@ -358,6 +360,7 @@ def set_voucher_clearance(doctype, docname, clearance_date, self):
 			"clearance_date",
 			clearance_date,
 		)
+		clear_bank_clearance_cache()
 
 	elif doctype == "Bank Transaction":
 		# For when a second bank transaction has fixed another, e.g. refund
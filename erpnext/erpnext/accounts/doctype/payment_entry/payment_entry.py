@@ -1551,6 +1551,12 @@ def validate_inclusive_tax(tax, doc):
 			frappe.throw(_("Valuation type charges can not be marked as Inclusive"))
 
 
+def on_doctype_update():
+	frappe.db.add_index("Payment Entry", ["paid_from", "docstatus", "posting_date"])
+	frappe.db.add_index("Payment Entry", ["paid_to", "docstatus", "posting_date"])
+	frappe.db.add_index("Payment Entry", ["bank_account", "docstatus", "posting_date"])
+
+
 @frappe.whitelist()
 def get_outstanding_reference_documents(args, validate=False):
 	if isinstance(args, str):
@@ -1,6 +1,9 @@
 # Copyright (c) 2022, Frappe Technologies Pvt. Ltd. and contributors
 # For license information, please see license.txt
 
+from functools import lru_cache
+from itertools import takewhile
+
 import frappe
 from frappe import _
 from frappe.model.document import Document
@@ -31,20 +34,17 @@ class AssetDepreciationSchedule(Document):
 		self.validate_another_asset_depr_schedule_does_not_exist()
 
 	def validate_another_asset_depr_schedule_does_not_exist(self):
-		finance_book_filter = ["finance_book", "is", "not set"]
-		if self.finance_book:
-			finance_book_filter = ["finance_book", "=", self.finance_book]
-
-		asset_depr_schedule = frappe.db.exists(
-			"Asset Depreciation Schedule",
-			[
-				["asset", "=", self.asset],
-				finance_book_filter,
-				["docstatus", "<", 2],
-			],
-		)
+		filters = {
+			"asset": self.asset,
+			"finance_book": self.finance_book or ["is", "not set"],
+			"docstatus": ["<", 2],
+		}
+		if self.name:
+			filters["name"] = ["!=", self.name]
+
+		asset_depr_schedule = frappe.db.get_value("Asset Depreciation Schedule", filters, "name")
 
-		if asset_depr_schedule and asset_depr_schedule != self.name:
+		if asset_depr_schedule:
 			if self.finance_book:
 				frappe.throw(
 					_(
@@ -66,9 +66,22 @@ class AssetDepreciationSchedule(Document):
 			self.cancel_depreciation_entries()
 
 	def cancel_depreciation_entries(self):
-		for d in self.get("depreciation_schedule"):
-			if d.journal_entry:
-				frappe.get_doc("Journal Entry", d.journal_entry).cancel()
+		journal_entries = [d.journal_entry for d in self.get("depreciation_schedule") if d.journal_entry]
+		if not journal_entries:
+			return
+
+		# only load the entries that are still submitted
+		submitted_journal_entries = set(
+			frappe.get_all(
+				"Journal Entry",
+				filters={"name": ["in", journal_entries], "docstatus": 1},
+				pluck="name",
+			)
+		)
+
+		for journal_entry in journal_entries:
+			if journal_entry in submitted_journal_entries:
+				frappe.get_doc("Journal Entry", journal_entry).cancel()
 
 	def on_cancel(self):
 		self.db_set("status", "Cancelled")
@@ -76,15 +89,11 @@ class AssetDepreciationSchedule(Document):
 	def prepare_draft_asset_depr_schedule_data_from_asset_name_and_fb_name(self, asset_name, fb_name):
 		asset_doc = frappe.get_doc("Asset", asset_name)
 
-		finance_book_filter = ["finance_book", "is", "not set"]
-		if fb_name:
-			finance_book_filter = ["finance_book", "=", fb_name]
-
-		asset_finance_book_name = frappe.db.get_value(
-			doctype="Asset Finance Book",
-			filters=[["parent", "=", asset_name], finance_book_filter],
+		# the finance book rows are loaded with the asset, so pick the row instead of querying for it
+		asset_finance_book_doc = next(
+			(d for d in asset_doc.get("finance_books") if (d.finance_book or None) == (fb_name or None)),
+			None,
 		)
-		asset_finance_book_doc = frappe.get_doc("Asset Finance Book", asset_finance_book_name)
 
 		self.prepare_draft_asset_depr_schedule_data(asset_doc, asset_finance_book_doc)
 
@@ -106,8 +115,14 @@ class AssetDepreciationSchedule(Document):
 		if self.should_prepare_depreciation_schedule(
 			have_asset_details_been_modified, not_manual_depr_or_have_manual_depr_details_been_modified
 		):
-			self.make_depr_schedule(asset_doc, row, date_of_disposal, update_asset_finance_book_row)
-			self.set_accumulated_depreciation(asset_doc, row, date_of_disposal, date_of_return)
+			self.make_depr_schedule(
+				asset_doc,
+				row,
+				date_of_disposal,
+				update_asset_finance_book_row,
+				date_of_return=date_of_return,
+				set_accumulated_depreciation=True,
+			)
 
 	def have_asset_details_been_modified(self, asset_doc):
 		return (
@@ -163,17 +178,28 @@ class AssetDepreciationSchedule(Document):
 		date_of_disposal,
 		update_asset_finance_book_row=True,
 		value_after_depreciation=None,
+		date_of_return=None,
+		set_accumulated_depreciation=False,
 	):
 		if not self.get("depreciation_schedule"):
 			self.depreciation_schedule = []
 
 		if not asset_doc.available_for_use_date:
+			if set_accumulated_depreciation:
+				self.set_accumulated_depreciation(asset_doc, row, date_of_disposal, date_of_return)
 			return
 
 		start = self.clear_depr_schedule()
 
 		self._make_depr_schedule(
-			asset_doc, row, start, date_of_disposal, update_asset_finance_book_row, value_after_depreciation
+			asset_doc,
+			row,
+			start,
+			date_of_disposal,
+			update_asset_finance_book_row,
+			value_after_depreciation,
+			date_of_return,
+			set_accumulated_depreciation,
 		)
 
 	def clear_depr_schedule(self):
@@ -201,6 +227,8 @@ class AssetDepreciationSchedule(Document):
 		date_of_disposal,
 		update_asset_finance_book_row,
 		value_after_depreciation,
+		date_of_return=None,
+		set_accumulated_depreciation=False,
 	):
 		asset_doc.validate_asset_finance_books(row)
 
@@ -211,6 +239,51 @@ class AssetDepreciationSchedule(Document):
 		if update_asset_finance_book_row:
 			row.db_update()
 
+		# new rows are collected as plain dicts and appended to the child table in one go at the end,
+		# depreciation_schedule is the working view of the booked rows followed by the new ones
+		depreciation_schedule = list(self.get("depreciation_schedule"))
+		new_rows = []
+
+		# a schedule without booked rows gets its accumulated depreciation while it is generated,
+		# which is what set_accumulated_depreciation would otherwise work out in a second pass
+		accumulate_in_same_pass = set_accumulated_depreciation and not depreciation_schedule
+		if accumulate_in_same_pass:
+			amount_precision = self.precision("depreciation_amount", "depreciation_schedule")
+			accumulated_precision = self.precision(
+				"accumulated_depreciation_amount", "depreciation_schedule"
+			)
+			accumulated_depreciation = previous_accumulated_depreciation = flt(
+				self.opening_accumulated_depreciation
+			)
+			remaining_value = flt(value_after_depreciation)
+
+		def add_row(schedule_date, depreciation_amount):
+			nonlocal accumulated_depreciation, previous_accumulated_depreciation, remaining_value
+
+			# the working view keeps the unrounded amount, later rows are derived from it
+			depreciation_schedule.append(
+				frappe._dict(schedule_date=schedule_date, depreciation_amount=depreciation_amount)
+			)
+
+			new_row = {"schedule_date": schedule_date, "depreciation_amount": depreciation_amount}
+			if accumulate_in_same_pass:
+				depreciation_amount = flt(depreciation_amount, amount_precision)
+				remaining_value -= depreciation_amount
+				previous_accumulated_depreciation = accumulated_depreciation
+				accumulated_depreciation += depreciation_amount
+
+				new_row["depreciation_amount"] = depreciation_amount
+				new_row["accumulated_depreciation_amount"] = flt(
+					accumulated_depreciation, accumulated_precision
+				)
+
+			new_rows.append(new_row)
+
+		frequency_of_depreciation = cint(row.frequency_of_depreciation)
+		depreciation_start_date = getdate(row.depreciation_start_date)
+		available_for_use_date = getdate(asset_doc.available_for_use_date)
+		gross_purchase_amount_precision = asset_doc.precision("gross_purchase_amount")
+
 		final_number_of_depreciations = cint(row.total_number_of_depreciations) - cint(
 			self.number_of_depreciations_booked
 		)
@@ -222,57 +295,64 @@ class AssetDepreciationSchedule(Document):
 		has_wdv_or_dd_non_yearly_pro_rata = False
 		if (
 			row.depreciation_method in ("Written Down Value", "Double Declining Balance")
-			and cint(row.frequency_of_depreciation) != 12
+			and frequency_of_depreciation != 12
 		):
 			has_wdv_or_dd_non_yearly_pro_rata = _check_is_pro_rata(
 				asset_doc, row, wdv_or_dd_non_yearly=True
 			)
 
 		skip_row = False
-		should_get_last_day = is_last_day_of_the_month(row.depreciation_start_date)
+		should_get_last_day = is_last_day_of_the_month(depreciation_start_date)
 
 		depreciation_amount = 0
 
 		number_of_pending_depreciations = final_number_of_depreciations - start
+		last_schedule_idx = final_number_of_depreciations - 1
+
+		# unless it is daily pro-rata, the straight line amount is the same for every row
+		straight_line_depreciation_amount = None
+		if row.depreciation_method in ("Straight Line", "Manual") and not row.daily_prorata_based:
+			straight_line_depreciation_amount = get_straight_line_or_manual_depr_amount(
+				asset_doc, row, start, number_of_pending_depreciations
+			)
 
 		for n in range(start, final_number_of_depreciations):
 			# If depreciation is already completed (for double declining balance)
 			if skip_row:
 				continue
 
-			if n > 0 and len(self.get("depreciation_schedule")) > n - 1:
-				prev_depreciation_amount = self.get("depreciation_schedule")[n - 1].depreciation_amount
+			if n > 0 and len(depreciation_schedule) > n - 1:
+				prev_depreciation_amount = depreciation_schedule[n - 1].depreciation_amount
 			else:
 				prev_depreciation_amount = 0
 
-			depreciation_amount = get_depreciation_amount(
-				asset_doc,
-				value_after_depreciation,
-				row,
-				n,
-				prev_depreciation_amount,
-				has_wdv_or_dd_non_yearly_pro_rata,
-				number_of_pending_depreciations,
-			)
-
-			if not has_pro_rata or (
-				n < (cint(final_number_of_depreciations) - 1) or final_number_of_depreciations == 2
-			):
-				schedule_date = add_months(
-					row.depreciation_start_date, n * cint(row.frequency_of_depreciation)
+			if straight_line_depreciation_amount is not None:
+				depreciation_amount = straight_line_depreciation_amount
+			else:
+				depreciation_amount = get_depreciation_amount(
+					asset_doc,
+					value_after_depreciation,
+					row,
+					n,
+					prev_depreciation_amount,
+					has_wdv_or_dd_non_yearly_pro_rata,
+					number_of_pending_depreciations,
 				)
 
+			if not has_pro_rata or (n < last_schedule_idx or final_number_of_depreciations == 2):
+				schedule_date = add_months(depreciation_start_date, n * frequency_of_depreciation)
+
 				if should_get_last_day:
 					schedule_date = get_last_day(schedule_date)
 
 			# if asset is being sold or scrapped
 			if date_of_disposal:
 				from_date = add_months(
-					getdate(asset_doc.available_for_use_date),
+					available_for_use_date,
 					(asset_doc.number_of_depreciations_booked * row.frequency_of_depreciation),
 				)
-				if self.depreciation_schedule:
-					from_date = self.depreciation_schedule[-1].schedule_date
+				if depreciation_schedule:
+					from_date = depreciation_schedule[-1].schedule_date
 
 				depreciation_amount, days, months = _get_pro_rata_amt(
 					row,
@@ -282,10 +362,7 @@ class AssetDepreciationSchedule(Document):
 				)
 
 				if depreciation_amount > 0:
-					self.add_depr_schedule_row(
-						date_of_disposal,
-						depreciation_amount,
-					)
+					add_row(date_of_disposal, depreciation_amount)
 
 				break
 
@@ -296,43 +373,43 @@ class AssetDepreciationSchedule(Document):
 				and not self.opening_accumulated_depreciation
 			):
 				from_date = add_days(
-					asset_doc.available_for_use_date, -1
+					available_for_use_date, -1
 				)  # needed to calc depr amount for available_for_use_date too
 				depreciation_amount, days, months = _get_pro_rata_amt(
 					row,
 					depreciation_amount,
 					from_date,
-					row.depreciation_start_date,
+					depreciation_start_date,
 					has_wdv_or_dd_non_yearly_pro_rata,
 				)
 			elif n == 0 and has_wdv_or_dd_non_yearly_pro_rata and self.opening_accumulated_depreciation:
-				if not is_first_day_of_the_month(getdate(asset_doc.available_for_use_date)):
+				if not is_first_day_of_the_month(available_for_use_date):
 					from_date = get_last_day(
 						add_months(
-							getdate(asset_doc.available_for_use_date),
+							available_for_use_date,
 							((self.number_of_depreciations_booked - 1) * row.frequency_of_depreciation),
 						)
 					)
 				else:
 					from_date = add_months(
-						getdate(add_days(asset_doc.available_for_use_date, -1)),
+						add_days(available_for_use_date, -1),
 						(self.number_of_depreciations_booked * row.frequency_of_depreciation),
 					)
 				depreciation_amount, days, months = _get_pro_rata_amt(
 					row,
 					depreciation_amount,
 					from_date,
-					row.depreciation_start_date,
+					depreciation_start_date,
 					has_wdv_or_dd_non_yearly_pro_rata,
 				)
 
 			# For last row
-			elif has_pro_rata and n == cint(final_number_of_depreciations) - 1:
+			elif has_pro_rata and n == last_schedule_idx:
 				if not asset_doc.flags.increase_in_asset_life:
 					# In case of increase_in_asset_life, the asset.to_date is already set on asset_repair submission
 					asset_doc.to_date = add_months(
-						asset_doc.available_for_use_date,
-						(n + self.number_of_depreciations_booked) * cint(row.frequency_of_depreciation),
+						available_for_use_date,
+						(n + self.number_of_depreciations_booked) * frequency_of_depreciation,
 					)
 
 				depreciation_amount_without_pro_rata = depreciation_amount
@@ -346,21 +423,19 @@ class AssetDepreciationSchedule(Document):
 				)
 
 				depreciation_amount = self.get_adjusted_depreciation_amount(
-					depreciation_amount_without_pro_rata, depreciation_amount
+					depreciation_amount_without_pro_rata, depreciation_amount, depreciation_schedule
 				)
 
 				schedule_date = add_days(schedule_date, days)
 
 			if not depreciation_amount:
 				continue
-			value_after_depreciation -= flt(
-				depreciation_amount, asset_doc.precision("gross_purchase_amount")
-			)
+			value_after_depreciation -= flt(depreciation_amount, gross_purchase_amount_precision)
 
 			# Adjust depreciation amount in the last period based on the expected value after useful life
 			if row.expected_value_after_useful_life and (
 				(
-					n == cint(final_number_of_depreciations) - 1
+					n == last_schedule_idx
 					and value_after_depreciation != row.expected_value_after_useful_life
 				)
 				or value_after_depreciation < row.expected_value_after_useful_life
@@ -368,18 +443,41 @@ class AssetDepreciationSchedule(Document):
 				depreciation_amount += value_after_depreciation - row.expected_value_after_useful_life
 				skip_row = True
 
-			if flt(depreciation_amount, asset_doc.precision("gross_purchase_amount")) > 0:
-				self.add_depr_schedule_row(
-					schedule_date,
-					depreciation_amount,
-				)
+			if flt(depreciation_amount, gross_purchase_amount_precision) > 0:
+				add_row(schedule_date, depreciation_amount)
+
+		if (
+			accumulate_in_same_pass
+			and new_rows
+			and self.depreciation_method in ("Straight Line", "Manual")
+			and not date_of_disposal
+			and not date_of_return
+		):
+			# for the last row, if depreciation method = Straight Line
+			last_row = new_rows[-1]
+			last_row["depreciation_amount"] += flt(
+				remaining_value - flt(row.expected_value_after_useful_life), amount_precision
+			)
+			last_row["accumulated_depreciation_amount"] = flt(
+				previous_accumulated_depreciation + last_row["depreciation_amount"], accumulated_precision
+			)
+
+		self.extend("depreciation_schedule", new_rows)
+
+		if set_accumulated_depreciation and not accumulate_in_same_pass:
+			self.set_accumulated_depreciation(asset_doc, row, date_of_disposal, date_of_return)
 
 	# to ensure that final accumulated depreciation amount is accurate
 	def get_adjusted_depreciation_amount(
-		self, depreciation_amount_without_pro_rata, depreciation_amount_for_last_row
+		self,
+		depreciation_amount_without_pro_rata,
+		depreciation_amount_for_last_row,
+		depreciation_schedule=None,
 	):
 		if not self.opening_accumulated_depreciation:
-			depreciation_amount_for_first_row = self.get_depreciation_amount_for_first_row()
+			depreciation_amount_for_first_row = self.get_depreciation_amount_for_first_row(
+				depreciation_schedule
+			)
 
 			if (
 				depreciation_amount_for_first_row + depreciation_amount_for_last_row
@@ -391,21 +489,11 @@ class AssetDepreciationSchedule(Document):
 
 		return depreciation_amount_for_last_row
 
-	def get_depreciation_amount_for_first_row(self):
-		return self.get("depreciation_schedule")[0].depreciation_amount
+	def get_depreciation_amount_for_first_row(self, depreciation_schedule=None):
+		if depreciation_schedule is None:
+			depreciation_schedule = self.get("depreciation_schedule")
 
-	def add_depr_schedule_row(
-		self,
-		schedule_date,
-		depreciation_amount,
-	):
-		self.append(
-			"depreciation_schedule",
-			{
-				"schedule_date": schedule_date,
-				"depreciation_amount": depreciation_amount,
-			},
-		)
+		return depreciation_schedule[0].depreciation_amount
 
 	def set_accumulated_depreciation(
 		self,
@@ -415,47 +503,48 @@ class AssetDepreciationSchedule(Document):
 		date_of_return=None,
 		ignore_booked_entry=False,
 	):
-		straight_line_idx = [
-			d.idx
-			for d in self.get("depreciation_schedule")
-			if self.depreciation_method == "Straight Line" or self.depreciation_method == "Manual"
-		]
+		depreciation_schedule = self.get("depreciation_schedule")
+
+		# rows are numbered consecutively, so the last straight line row is simply the last row
+		last_straight_line_idx = None
+		if self.depreciation_method in ("Straight Line", "Manual") and depreciation_schedule:
+			last_straight_line_idx = len(depreciation_schedule) - 1
+
+		# precision comes from the child doctype, so it is the same for every row
+		amount_precision = self.precision("depreciation_amount", "depreciation_schedule")
+		accumulated_precision = self.precision(
+			"accumulated_depreciation_amount", "depreciation_schedule"
+		)
 
 		accumulated_depreciation = None
 		value_after_depreciation = flt(row.value_after_depreciation)
 
-		for i, d in enumerate(self.get("depreciation_schedule")):
+		for i, d in enumerate(depreciation_schedule):
 			if ignore_booked_entry and d.journal_entry:
 				continue
 
 			if not accumulated_depreciation:
 				if i > 0 and asset_doc.flags.decrease_in_asset_value_due_to_value_adjustment:
-					accumulated_depreciation = self.get("depreciation_schedule")[
-						i - 1
-					].accumulated_depreciation_amount
+					accumulated_depreciation = depreciation_schedule[i - 1].accumulated_depreciation_amount
 				else:
 					accumulated_depreciation = flt(self.opening_accumulated_depreciation)
 
-			depreciation_amount = flt(d.depreciation_amount, d.precision("depreciation_amount"))
+			depreciation_amount = flt(d.depreciation_amount, amount_precision)
 			value_after_depreciation -= flt(depreciation_amount)
 
 			# for the last row, if depreciation method = Straight Line
 			if (
-				straight_line_idx
-				and i == max(straight_line_idx) - 1
+				i == last_straight_line_idx
 				and not date_of_disposal
 				and not date_of_return
 			):
 				depreciation_amount += flt(
-					value_after_depreciation - flt(row.expected_value_after_useful_life),
-					d.precision("depreciation_amount"),
+					value_after_depreciation - flt(row.expected_value_after_useful_life), amount_precision
 				)
 
 			d.depreciation_amount = depreciation_amount
 			accumulated_depreciation += d.depreciation_amount
-			d.accumulated_depreciation_amount = flt(
-				accumulated_depreciation, d.precision("accumulated_depreciation_amount")
-			)
+			d.accumulated_depreciation_amount = flt(accumulated_depreciation, accumulated_precision)
 
 
 def _get_value_after_depreciation_for_making_schedule(asset_doc, fb_row):
@@ -476,14 +565,20 @@ def _check_is_pro_rata(asset_doc, row, wdv_or_dd_non_yearly=False):
 	# if not existing asset, from_date = available_for_use_date
 	# otherwise, if number_of_depreciations_booked = 2, available_for_use_date = 01/01/2020 and frequency_of_depreciation = 12
 	# from_date = 01/01/2022
-	from_date = _get_modified_available_for_use_date(asset_doc, row, wdv_or_dd_non_yearly)
-	days = date_diff(row.depreciation_start_date, from_date) + 1
+	if not cint(asset_doc.number_of_depreciations_booked):
+		# nothing booked yet, so there are no months to shift available_for_use_date by
+		from_date = getdate(asset_doc.available_for_use_date)
+	else:
+		from_date = _get_modified_available_for_use_date(asset_doc, row, wdv_or_dd_non_yearly)
+
+	depreciation_start_date = getdate(row.depreciation_start_date)
+	days = date_diff(depreciation_start_date, from_date) + 1
 
 	if wdv_or_dd_non_yearly:
-		total_days = get_total_days(row.depreciation_start_date, 12)
+		total_days = get_total_days(depreciation_start_date, 12)
 	else:
 		# if frequency_of_depreciation is 12 months, total_days = 365
-		total_days = get_total_days(row.depreciation_start_date, row.frequency_of_depreciation)
+		total_days = get_total_days(depreciation_start_date, row.frequency_of_depreciation)
 
 	if days < total_days:
 		has_pro_rata = True
@@ -507,6 +602,8 @@ def _get_modified_available_for_use_date(asset_doc, row, wdv_or_dd_non_yearly=Fa
 def _get_pro_rata_amt(
 	row, depreciation_amount, from_date, to_date, has_wdv_or_dd_non_yearly_pro_rata=False
 ):
+	from_date, to_date = getdate(from_date), getdate(to_date)
+
 	days = date_diff(to_date, from_date)
 	months = month_diff(to_date, from_date)
 	if has_wdv_or_dd_non_yearly_pro_rata:
@@ -518,7 +615,13 @@ def _get_pro_rata_amt(
 
 
 def get_total_days(date, frequency):
-	period_start_date = add_months(date, cint(frequency) * -1)
+	return _get_total_days(getdate(date), cint(frequency))
+
+
+# a schedule only ever asks for a handful of distinct (date, frequency) pairs
+@lru_cache(maxsize=4096)
+def _get_total_days(date, frequency):
+	period_start_date = add_months(date, frequency * -1)
 
 	if is_last_day_of_the_month(date):
 		period_start_date = get_last_day(period_start_date)
@@ -561,6 +664,8 @@ def get_updated_rate_of_depreciation_for_wdv_and_dd(asset, depreciable_value, fb
 def get_straight_line_or_manual_depr_amount(
 	asset, row, schedule_idx, number_of_pending_depreciations
 ):
+	depreciation_start_date = getdate(row.depreciation_start_date)
+
 	# if the Depreciation Schedule is being modified after Asset Repair due to increase in asset life and value
 	if asset.flags.increase_in_asset_life:
 		return (flt(row.value_after_depreciation) - flt(row.expected_value_after_useful_life)) / (
@@ -579,7 +684,7 @@ def get_straight_line_or_manual_depr_amount(
 			) / date_diff(
 				get_last_day(
 					add_months(
-						row.depreciation_start_date,
+						depreciation_start_date,
 						flt(row.total_number_of_depreciations - asset.number_of_depreciations_booked - 1)
 						* row.frequency_of_depreciation,
 					)
@@ -587,7 +692,7 @@ def get_straight_line_or_manual_depr_amount(
 				add_days(
 					get_last_day(
 						add_months(
-							row.depreciation_start_date,
+							depreciation_start_date,
 							flt(
 								row.total_number_of_depreciations
 								- asset.number_of_depreciations_booked
@@ -602,11 +707,11 @@ def get_straight_line_or_manual_depr_amount(
 			)
 
 			to_date = get_last_day(
-				add_months(row.depreciation_start_date, schedule_idx * row.frequency_of_depreciation)
+				add_months(depreciation_start_date, schedule_idx * row.frequency_of_depreciation)
 			)
 			from_date = add_days(
 				get_last_day(
-					add_months(row.depreciation_start_date, (schedule_idx - 1) * row.frequency_of_depreciation)
+					add_months(depreciation_start_date, (schedule_idx - 1) * row.frequency_of_depreciation)
 				),
 				1,
 			)
@@ -626,22 +731,22 @@ def get_straight_line_or_manual_depr_amount(
 			) / date_diff(
 				get_last_day(
 					add_months(
-						row.depreciation_start_date,
+						depreciation_start_date,
 						flt(row.total_number_of_depreciations - asset.number_of_depreciations_booked - 1)
 						* row.frequency_of_depreciation,
 					)
 				),
 				add_days(
-					get_last_day(add_months(row.depreciation_start_date, -1 * row.frequency_of_depreciation)), 1
+					get_last_day(add_months(depreciation_start_date, -1 * row.frequency_of_depreciation)), 1
 				),
 			)
 
 			to_date = get_last_day(
-				add_months(row.depreciation_start_date, schedule_idx * row.frequency_of_depreciation)
+				add_months(depreciation_start_date, schedule_idx * row.frequency_of_depreciation)
 			)
 			from_date = add_days(
 				get_last_day(
-					add_months(row.depreciation_start_date, (schedule_idx - 1) * row.frequency_of_depreciation)
+					add_months(depreciation_start_date, (schedule_idx - 1) * row.frequency_of_depreciation)
 				),
 				1,
 			)
@@ -663,40 +768,34 @@ def get_wdv_or_dd_depr_amount(
 	prev_depreciation_amount,
 	has_wdv_or_dd_non_yearly_pro_rata,
 ):
-	if cint(frequency_of_depreciation) == 12:
-		return flt(depreciable_value) * (flt(rate_of_depreciation) / 100)
+	depreciable_value = flt(depreciable_value)
+	rate_of_depreciation = flt(rate_of_depreciation)
+	frequency_of_depreciation = cint(frequency_of_depreciation)
+
+	if frequency_of_depreciation == 12:
+		return depreciable_value * (rate_of_depreciation / 100)
+
+	# the rate changes once a year, so only the first row of each year is recalculated
+	first_row_of_the_year = 1 if has_wdv_or_dd_non_yearly_pro_rata else 0
+
+	if has_wdv_or_dd_non_yearly_pro_rata and schedule_idx == 0:
+		return depreciable_value * (rate_of_depreciation / 100)
+	elif schedule_idx % (12 / frequency_of_depreciation) == first_row_of_the_year:
+		return depreciable_value * frequency_of_depreciation * (rate_of_depreciation / 1200)
 	else:
-		if has_wdv_or_dd_non_yearly_pro_rata:
-			if schedule_idx == 0:
-				return flt(depreciable_value) * (flt(rate_of_depreciation) / 100)
-			elif schedule_idx % (12 / cint(frequency_of_depreciation)) == 1:
-				return (
-					flt(depreciable_value) * flt(frequency_of_depreciation) * (flt(rate_of_depreciation) / 1200)
-				)
-			else:
-				return prev_depreciation_amount
-		else:
-			if schedule_idx % (12 / cint(frequency_of_depreciation)) == 0:
-				return (
-					flt(depreciable_value) * flt(frequency_of_depreciation) * (flt(rate_of_depreciation) / 1200)
-				)
-			else:
-				return prev_depreciation_amount
+		return prev_depreciation_amount
 
 
 def make_draft_asset_depr_schedules_if_not_present(asset_doc):
 	asset_depr_schedules_names = []
+	existing_asset_depr_schedules = get_asset_depr_schedule_names(asset_doc.name, ("Draft", "Active"))
 
 	for row in asset_doc.get("finance_books"):
-		draft_asset_depr_schedule_name = get_asset_depr_schedule_name(
-			asset_doc.name, "Draft", row.finance_book
-		)
+		finance_book = row.finance_book or None
 
-		active_asset_depr_schedule_name = get_asset_depr_schedule_name(
-			asset_doc.name, "Active", row.finance_book
-		)
-
-		if not draft_asset_depr_schedule_name and not active_asset_depr_schedule_name:
+		if not any(
+			(finance_book, status) in existing_asset_depr_schedules for status in ("Draft", "Active")
+		):
 			name = make_draft_asset_depr_schedule(asset_doc, row)
 			asset_depr_schedules_names.append(name)
 
@@ -724,35 +823,43 @@ def make_draft_asset_depr_schedule(asset_doc, row):
 
 
 def update_draft_asset_depr_schedules(asset_doc):
+	draft_asset_depr_schedules = get_asset_depr_schedule_names(asset_doc.name, ("Draft",))
+
 	for row in asset_doc.get("finance_books"):
-		asset_depr_schedule_doc = get_asset_depr_schedule_doc(asset_doc.name, "Draft", row.finance_book)
+		asset_depr_schedule_name = draft_asset_depr_schedules.get((row.finance_book or None, "Draft"))
 
-		if not asset_depr_schedule_doc:
+		if not asset_depr_schedule_name:
 			continue
 
+		asset_depr_schedule_doc = frappe.get_doc("Asset Depreciation Schedule", asset_depr_schedule_name)
+
 		asset_depr_schedule_doc.prepare_draft_asset_depr_schedule_data(asset_doc, row)
 
 		asset_depr_schedule_doc.save()
 
 
 def convert_draft_asset_depr_schedules_into_active(asset_doc):
+	draft_asset_depr_schedules = get_asset_depr_schedule_names(asset_doc.name, ("Draft",))
+
 	for row in asset_doc.get("finance_books"):
-		asset_depr_schedule_doc = get_asset_depr_schedule_doc(asset_doc.name, "Draft", row.finance_book)
+		asset_depr_schedule_name = draft_asset_depr_schedules.get((row.finance_book or None, "Draft"))
 
-		if not asset_depr_schedule_doc:
+		if not asset_depr_schedule_name:
 			continue
 
-		asset_depr_schedule_doc.submit()
+		frappe.get_doc("Asset Depreciation Schedule", asset_depr_schedule_name).submit()
 
 
 def cancel_asset_depr_schedules(asset_doc):
+	active_asset_depr_schedules = get_asset_depr_schedule_names(asset_doc.name, ("Active",))
+
 	for row in asset_doc.get("finance_books"):
-		asset_depr_schedule_doc = get_asset_depr_schedule_doc(asset_doc.name, "Active", row.finance_book)
+		asset_depr_schedule_name = active_asset_depr_schedules.get((row.finance_book or None, "Active"))
 
-		if not asset_depr_schedule_doc:
+		if not asset_depr_schedule_name:
 			continue
 
-		asset_depr_schedule_doc.cancel()
+		frappe.get_doc("Asset Depreciation Schedule", asset_depr_schedule_name).cancel()
 
 
 def make_new_active_asset_depr_schedules_and_cancel_current_ones(
@@ -763,19 +870,26 @@ def make_new_active_asset_depr_schedules_and_cancel_current_ones(
 	value_after_depreciation=None,
 	ignore_booked_entry=False,
 ):
+	active_asset_depr_schedules = get_asset_depr_schedule_names(asset_doc.name, ("Active",))
+
 	for row in asset_doc.get("finance_books"):
-		current_asset_depr_schedule_doc = get_asset_depr_schedule_doc(
-			asset_doc.name, "Active", row.finance_book
+		current_asset_depr_schedule_name = active_asset_depr_schedules.get(
+			(row.finance_book or None, "Active")
 		)
 
-		if not current_asset_depr_schedule_doc:
+		if not current_asset_depr_schedule_name:
 			frappe.throw(
 				_("Asset Depreciation Schedule not found for Asset {0} and Finance Book {1}").format(
 					asset_doc.name, row.finance_book
 				)
 			)
 
-		new_asset_depr_schedule_doc = frappe.copy_doc(current_asset_depr_schedule_doc)
+		current_asset_depr_schedule_doc = frappe.get_doc(
+			"Asset Depreciation Schedule", current_asset_depr_schedule_name
+		)
+		new_asset_depr_schedule_doc = copy_asset_depr_schedule_with_booked_rows(
+			current_asset_depr_schedule_doc
+		)
 
 		if asset_doc.flags.increase_in_asset_value_due_to_repair and row.depreciation_method in (
 			"Written Down Value",
@@ -802,6 +916,16 @@ def make_new_active_asset_depr_schedules_and_cancel_current_ones(
 		new_asset_depr_schedule_doc.submit()
 
 
+def copy_asset_depr_schedule_with_booked_rows(asset_depr_schedule_doc):
+	"""copy_doc without the unbooked rows, make_depr_schedule drops and regenerates them anyway"""
+	doc_dict = asset_depr_schedule_doc.as_dict()
+	doc_dict["depreciation_schedule"] = list(
+		takewhile(lambda d: d.journal_entry, doc_dict.get("depreciation_schedule") or [])
+	)
+
+	return frappe.copy_doc(doc_dict)
+
+
 def get_temp_asset_depr_schedule_doc(
 	asset_doc, row, date_of_disposal=None, date_of_return=None, update_asset_finance_book_row=False
 ):
@@ -865,6 +989,21 @@ def get_asset_depr_schedule_name(asset_name, status, finance_book=None):
 	)
 
 
+def on_doctype_update():
+	frappe.db.add_index("Asset Depreciation Schedule", ["asset", "finance_book", "docstatus"])
+
+
+def get_asset_depr_schedule_names(asset_name, statuses):
+	"""Returns {(finance_book, status): name} for the asset's schedules in the given statuses"""
+	asset_depr_schedules = frappe.get_all(
+		"Asset Depreciation Schedule",
+		filters={"asset": asset_name, "status": ["in", statuses]},
+		fields=["name", "status", "finance_book"],
+	)
+
+	return {(d.finance_book or None, d.status): d.name for d in asset_depr_schedules}
+
+
 def is_first_day_of_the_month(date):
 	first_day_of_the_month = get_first_day(date)
 
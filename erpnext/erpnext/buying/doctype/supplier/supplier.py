@@ -37,8 +37,15 @@ class Supplier(TransactionBase):
 		info = get_dashboard_info(self.doctype, self.name)
 		self.set_onload("dashboard_info", info)
 
+	def get_supp_master_name(self):
+		# read once per document, autoname, validate and after_rename all need it
+		if "supp_master_name" not in self.flags:
+			self.flags.supp_master_name = frappe.defaults.get_global_default("supp_master_name")
+
+		return self.flags.supp_master_name
+
 	def autoname(self):
-		supp_master_name = frappe.defaults.get_global_default("supp_master_name")
+		supp_master_name = self.get_supp_master_name()
 		if supp_master_name == "Supplier Name":
 			self.name = self.supplier_name
 		elif supp_master_name == "Naming Series":
@@ -51,8 +58,26 @@ class Supplier(TransactionBase):
 		self.create_primary_address()
 
 	def add_role_for_user(self):
-		for portal_user in self.portal_users:
-			add_role_for_portal_user(portal_user, "Supplier")
+		# roles are only granted to newly added portal users
+		new_portal_users = [d for d in self.portal_users if d.is_new()]
+		if not new_portal_users:
+			return
+
+		users_with_role = set(
+			frappe.get_all(
+				"Has Role",
+				filters={
+					"parenttype": "User",
+					"parent": ["in", [d.user for d in new_portal_users]],
+					"role": "Supplier",
+				},
+				pluck="parent",
+			)
+		)
+
+		for portal_user in new_portal_users:
+			if portal_user.user not in users_with_role:
+				add_role_for_portal_user(portal_user, "Supplier")
 
 	def _add_supplier_role(self, portal_user):
 		if not portal_user.is_new():
@@ -80,7 +105,7 @@ class Supplier(TransactionBase):
 		self.flags.is_new_doc = self.is_new()
 
 		# validation for Naming Series mandatory field...
-		if frappe.defaults.get_global_default("supp_master_name") == "Naming Series":
+		if self.get_supp_master_name() == "Naming Series":
 			if not self.naming_series:
 				msgprint(_("Series is mandatory"), raise_exception=1)
 
@@ -109,14 +134,16 @@ class Supplier(TransactionBase):
 		if not self.is_internal_supplier:
 			self.represents_company = ""
 
-		internal_supplier = frappe.db.get_value(
+		if not self.is_internal_supplier or not self.represents_company:
+			return
+
+		internal_supplier = frappe.db.exists(
 			"Supplier",
 			{
 				"is_internal_supplier": 1,
 				"represents_company": self.represents_company,
 				"name": ("!=", self.name),
 			},
-			"name",
 		)
 
 		if internal_supplier:
@@ -132,9 +159,13 @@ class Supplier(TransactionBase):
 		if not self.supplier_primary_contact:
 			if self.mobile_no or self.email_id:
 				contact = make_contact(self)
-				self.db_set("supplier_primary_contact", contact.name)
-				self.db_set("mobile_no", self.mobile_no)
-				self.db_set("email_id", self.email_id)
+				self.db_set(
+					{
+						"supplier_primary_contact": contact.name,
+						"mobile_no": self.mobile_no,
+						"email_id": self.email_id,
+					}
+				)
 
 	def create_primary_address(self):
 		from frappe.contacts.doctype.address.address import get_address_display
@@ -145,19 +176,21 @@ class Supplier(TransactionBase):
 			address = make_address(self)
 			address_display = get_address_display(address.name)
 
-			self.db_set("supplier_primary_address", address.name)
-			self.db_set("primary_address", address_display)
+			self.db_set({"supplier_primary_address": address.name, "primary_address": address_display})
 
 	def on_trash(self):
-		if self.supplier_primary_contact:
-			self.db_set("supplier_primary_contact", None)
-		if self.supplier_primary_address:
-			self.db_set("supplier_primary_address", None)
+		primary_links = {
+			fieldname: None
+			for fieldname in ("supplier_primary_contact", "supplier_primary_address")
+			if self.get(fieldname)
+		}
+		if primary_links:
+			self.db_set(primary_links)
 
 		delete_contact_and_address("Supplier", self.name)
 
 	def after_rename(self, olddn, newdn, merge=False):
-		if frappe.defaults.get_global_default("supp_master_name") == "Supplier Name":
+		if self.get_supp_master_name() == "Supplier Name":
 			self.db_set("supplier_name", newdn)
 
 
@@ -165,16 +198,19 @@ class Supplier(TransactionBase):
 @frappe.validate_and_sanitize_search_inputs
 def get_supplier_primary_contact(doctype, txt, searchfield, start, page_len, filters):
 	supplier = filters.get("supplier")
-	return frappe.db.sql(
-		"""
-		SELECT
-			`tabContact`.name from `tabContact`,
-			`tabDynamic Link`
-		WHERE
-			`tabContact`.name = `tabDynamic Link`.parent
-			and `tabDynamic Link`.link_name = %(supplier)s
-			and `tabDynamic Link`.link_doctype = 'Supplier'
-			and `tabContact`.name like %(txt)s
-		""",
-		{"supplier": supplier, "txt": "%%%s%%" % txt},
-	)
+	contact = frappe.qb.DocType("Contact")
+	dynamic_link = frappe.qb.DocType("Dynamic Link")
+
+	return (
+		frappe.qb.from_(contact)
+		.inner_join(dynamic_link)
+		.on(contact.name == dynamic_link.parent)
+		.select(contact.name)
+		.where(
+			(dynamic_link.link_name == supplier)
+			& (dynamic_link.link_doctype == "Supplier")
+			& (contact.name.like(f"%{txt}%"))
+		)
+		.limit(page_len)
+		.offset(start)
+	).run()
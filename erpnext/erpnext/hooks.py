@@ -319,6 +319,10 @@ doc_events = {
 	tuple(period_closing_doctypes): {
 		"validate": "erpnext.accounts.doctype.accounting_period.accounting_period.validate_accounting_period_on_doc_save",
 	},
+	("Payment Entry", "Journal Entry", "Sales Invoice", "Purchase Invoice"): {
+		"on_submit": "erpnext.accounts.doctype.bank_clearance.bank_clearance.clear_bank_clearance_cache_on_change",
+		"on_cancel": "erpnext.accounts.doctype.bank_clearance.bank_clearance.clear_bank_clearance_cache_on_change",
+	},
 	"Stock Entry": {
 		"on_submit": "erpnext.stock.doctype.material_request.material_request.update_completed_and_requested_qty",
 		"on_cancel": "erpnext.stock.doctype.material_request.material_request.update_completed_and_requested_qty",
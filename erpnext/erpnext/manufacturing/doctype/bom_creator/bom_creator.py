@@ -1,7 +1,7 @@
 # Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and contributors
 # For license information, please see license.txt
 
-from collections import OrderedDict
+from collections import defaultdict
 
 import frappe
 from frappe import _
@@ -30,6 +30,8 @@ BOM_ITEM_FIELDS = [
 	"do_not_explode",
 ]
 
+STATUS_BY_DOCSTATUS = ("Draft", "Submitted", "Cancelled")
+
 
 class BOMCreator(Document):
 	def before_save(self):
@@ -43,16 +45,12 @@ class BOMCreator(Document):
 		self.validate_items()
 
 	def validate_items(self):
-		for row in self.items:
-			if row.is_expandable and row.item_code == self.item_code:
-				frappe.throw(_("Item {0} cannot be added as a sub-assembly of itself").format(row.item_code))
+		item_code = self.item_code
+		if any(row.is_expandable and row.item_code == item_code for row in self.items):
+			frappe.throw(_("Item {0} cannot be added as a sub-assembly of itself").format(item_code))
 
 	def set_status(self, save=False):
-		self.status = {
-			0: "Draft",
-			1: "Submitted",
-			2: "Cancelled",
-		}[self.docstatus]
+		self.status = STATUS_BY_DOCSTATUS[self.docstatus]
 
 		self.set_status_completed()
 		if save:
@@ -80,22 +78,25 @@ class BOMCreator(Document):
 		self.set_status(True)
 
 	def set_conversion_factor(self):
+		# rows added through add_item / add_sub_assembly already carry 1
 		for row in self.items:
-			row.conversion_factor = 1.0
+			if row.conversion_factor != 1.0:
+				row.conversion_factor = 1.0
 
 	def before_submit(self):
 		self.validate_fields()
 		self.set_status()
 
 	def set_reference_id(self):
-		parent_reference = {row.idx: row.name for row in self.items}
-
-		for row in self.items:
-			if row.fg_reference_id:
-				continue
+		rows_without_reference = [
+			row for row in self.items if row.parent_row_no and not row.fg_reference_id
+		]
+		if not rows_without_reference:
+			return
 
-			if row.parent_row_no:
-				row.fg_reference_id = parent_reference.get(row.parent_row_no)
+		parent_reference = {row.idx: row.name for row in self.items}
+		for row in rows_without_reference:
+			row.fg_reference_id = parent_reference.get(row.parent_row_no)
 
 	@frappe.whitelist()
 	def add_boms(self):
@@ -112,42 +113,108 @@ class BOMCreator(Document):
 		if not fg_reference_id:
 			fg_reference_id = self.name
 
+		# group the rows under their parent once, instead of scanning all items for every sub-assembly
+		items_by_fg_reference_id = defaultdict(list)
 		for row in self.items:
-			if row.fg_reference_id != fg_reference_id:
-				continue
+			items_by_fg_reference_id[row.fg_reference_id].append(row)
 
-			if not row.is_expandable:
-				row.rate = get_bom_item_rate(
-					{
-						"company": self.company,
-						"item_code": row.item_code,
-						"bom_no": "",
-						"qty": row.qty,
-						"uom": row.uom,
-						"stock_uom": row.stock_uom,
-						"conversion_factor": row.conversion_factor,
-						"sourced_by_supplier": row.sourced_by_supplier,
-					},
-					self,
-				)
+		return self._get_raw_material_cost(items_by_fg_reference_id, {}, fg_reference_id, amount)
 
+	def _get_raw_material_cost(
+		self, items_by_fg_reference_id, bom_item_rates, fg_reference_id, amount=0
+	):
+		for row in items_by_fg_reference_id.get(fg_reference_id, []):
+			if not row.is_expandable:
+				row.rate = self.get_bom_item_rate(row, bom_item_rates)
 				row.amount = flt(row.rate) * flt(row.qty)
 
 			else:
 				row.amount = 0.0
-				row.amount = self.get_raw_material_cost(row.name, row.amount)
+				row.amount = self._get_raw_material_cost(
+					items_by_fg_reference_id, bom_item_rates, row.name, row.amount
+				)
 				row.rate = flt(row.amount) / (flt(row.qty) * flt(row.conversion_factor))
 
 			amount += flt(row.amount)
 
 		return amount
 
+	def update_amount_for_row(self, row_name):
+		"""Recosts a row whose qty changed and the sub-assemblies above it, without a full save"""
+		if self.rm_cost_as_per == "Manual":
+			return
+
+		items_by_name = {}
+		items_by_fg_reference_id = defaultdict(list)
+		for d in self.items:
+			items_by_name[d.name] = d
+			items_by_fg_reference_id[d.fg_reference_id].append(d)
+
+		row = items_by_name[row_name]
+		if row.is_expandable:
+			# the amount of a sub-assembly comes from its components, only the rate follows the qty
+			row.rate = flt(row.amount) / (flt(row.qty) * flt(row.conversion_factor))
+			row.db_set("rate", row.rate, update_modified=False)
+			return
+
+		row.rate = self.get_bom_item_rate(row, {})
+		row.amount = flt(row.rate) * flt(row.qty)
+		row.db_set({"rate": row.rate, "amount": row.amount}, update_modified=False)
+
+		parent_row = items_by_name.get(row.fg_reference_id)
+		while parent_row:
+			parent_row.amount = 0.0
+			for d in items_by_fg_reference_id[parent_row.name]:
+				parent_row.amount += flt(d.amount)
+
+			parent_row.rate = flt(parent_row.amount) / (
+				flt(parent_row.qty) * flt(parent_row.conversion_factor)
+			)
+			parent_row.db_set(
+				{"rate": parent_row.rate, "amount": parent_row.amount}, update_modified=False
+			)
+			parent_row = items_by_name.get(parent_row.fg_reference_id)
+
+		raw_material_cost = 0
+		for d in items_by_fg_reference_id[self.name]:
+			raw_material_cost += flt(d.amount)
+
+		self.db_set("raw_material_cost", raw_material_cost)
+
+	def get_bom_item_rate(self, row, bom_item_rates):
+		# the same raw material is often used under several sub-assemblies,
+		# price list rates can depend on the qty so it is part of the key there
+		key = (
+			row.item_code,
+			row.qty if self.rm_cost_as_per == "Price List" else None,
+			row.uom,
+			row.stock_uom,
+			row.conversion_factor,
+			row.sourced_by_supplier,
+		)
+
+		if key not in bom_item_rates:
+			bom_item_rates[key] = get_bom_item_rate(
+				{
+					"company": self.company,
+					"item_code": row.item_code,
+					"bom_no": "",
+					"qty": row.qty,
+					"uom": row.uom,
+					"stock_uom": row.stock_uom,
+					"conversion_factor": row.conversion_factor,
+					"sourced_by_supplier": row.sourced_by_supplier,
+				},
+				self,
+			)
+
+		return bom_item_rates[key]
+
 	def set_is_expandable(self):
-		fg_items = [row.fg_item for row in self.items if row.fg_item != self.item_code]
+		item_code = self.item_code
+		fg_items = {row.fg_item for row in self.items if row.fg_item != item_code}
 		for row in self.items:
-			row.is_expandable = 0
-			if row.item_code in fg_items:
-				row.is_expandable = 1
+			row.is_expandable = 1 if row.item_code in fg_items else 0
 
 	def validate_fields(self):
 		fields = {
@@ -187,7 +254,7 @@ class BOMCreator(Document):
 		"""
 
 		self.db_set("status", "In Progress")
-		production_item_wise_rm = OrderedDict({})
+		production_item_wise_rm = {}
 		production_item_wise_rm.setdefault(
 			(self.item_code, self.name), frappe._dict({"items": [], "bom_no": "", "fg_item_data": self})
 		)
@@ -201,12 +268,11 @@ class BOMCreator(Document):
 
 			production_item_wise_rm[(row.fg_item, row.fg_reference_id)]["items"].append(row)
 
-		reverse_tree = OrderedDict(reversed(list(production_item_wise_rm.items())))
-
 		try:
-			for d in reverse_tree:
+			existing_boms = self.get_existing_boms()
+			for d in reversed(production_item_wise_rm):
 				fg_item_data = production_item_wise_rm.get(d).fg_item_data
-				self.create_bom(fg_item_data, production_item_wise_rm)
+				self.create_bom(fg_item_data, production_item_wise_rm, existing_boms)
 
 			frappe.msgprint(_("BOMs created successfully"))
 		except Exception:
@@ -220,17 +286,23 @@ class BOMCreator(Document):
 
 			frappe.msgprint(_("BOMs creation failed"))
 
-	def create_bom(self, row, production_item_wise_rm):
+	def get_existing_boms(self):
+		"""Returns {(item, bom_creator_item)} of the BOMs already submitted for this BOM Creator"""
+		return {
+			(d.item, d.bom_creator_item or "")
+			for d in frappe.get_all(
+				"BOM",
+				filters={"bom_creator": self.name, "docstatus": 1},
+				fields=["item", "bom_creator_item"],
+			)
+		}
+
+	def create_bom(self, row, production_item_wise_rm, existing_boms=None):
 		bom_creator_item = row.name if row.name != self.name else ""
-		if frappe.db.exists(
-			"BOM",
-			{
-				"bom_creator": self.name,
-				"item": row.item_code,
-				"bom_creator_item": bom_creator_item,
-				"docstatus": 1,
-			},
-		):
+		if existing_boms is None:
+			existing_boms = self.get_existing_boms()
+
+		if (row.item_code, bom_creator_item) in existing_boms:
 			return
 
 		bom = frappe.new_doc("BOM")
@@ -246,9 +318,7 @@ class BOMCreator(Document):
 			}
 		)
 
-		for field in BOM_FIELDS:
-			if self.get(field):
-				bom.set(field, self.get(field))
+		bom.update({field: value for field in BOM_FIELDS if (value := self.get(field))})
 
 		for item in production_item_wise_rm[(row.item_code, row.name)]["items"]:
 			bom_no = ""
@@ -257,10 +327,7 @@ class BOMCreator(Document):
 				bom_no = production_item_wise_rm.get((item.item_code, item.name)).bom_no
 				item.do_not_explode = 0
 
-			item_args = {}
-			for field in BOM_ITEM_FIELDS:
-				item_args[field] = item.get(field)
-
+			item_args = {field: item.get(field) for field in BOM_ITEM_FIELDS}
 			item_args.update(
 				{
 					"bom_no": bom_no,
@@ -349,10 +416,13 @@ def add_sub_assembly(**kwargs):
 	doc = frappe.get_doc("BOM Creator", kwargs.parent)
 	bom_item = frappe.parse_json(kwargs.bom_item)
 
+	rows = [frappe._dict(row) for row in bom_item.get("items")]
+	items_info = get_items_details({bom_item.item_code, *(row.item_code for row in rows)})
+
 	name = kwargs.fg_reference_id
 	parent_row_no = ""
 	if not kwargs.convert_to_sub_assembly:
-		item_info = get_item_details(bom_item.item_code)
+		item_info = items_info[bom_item.item_code]
 		item_row = doc.append(
 			"items",
 			{
@@ -373,9 +443,8 @@ def add_sub_assembly(**kwargs):
 		parent_row_no = item_row.idx
 		name = ""
 
-	for row in bom_item.get("items"):
-		row = frappe._dict(row)
-		item_info = get_item_details(row.item_code)
+	for row in rows:
+		item_info = items_info[row.item_code]
 		doc.append(
 			"items",
 			{
@@ -403,6 +472,18 @@ def get_item_details(item_code):
 	)
 
 
+def get_items_details(item_codes):
+	"""Returns {item_code: details} for all the items with a single query"""
+	return {
+		d.name: d
+		for d in frappe.get_all(
+			"Item",
+			filters={"name": ["in", list(item_codes)]},
+			fields=["name", "item_name", "description", "image", "stock_uom", "default_bom"],
+		)
+	}
+
+
 @frappe.whitelist()
 def delete_node(**kwargs):
 	if isinstance(kwargs, str):
@@ -411,14 +492,28 @@ def delete_node(**kwargs):
 	if isinstance(kwargs, dict):
 		kwargs = frappe._dict(kwargs)
 
-	items = get_children(parent=kwargs.fg_item, parent_id=kwargs.parent)
-	if kwargs.docname:
-		frappe.delete_doc("BOM Creator Item", kwargs.docname)
+	items_to_delete = [kwargs.docname] if kwargs.docname else []
+
+	# collect the whole subtree level by level, then delete it with a single query
+	fg_items = {kwargs.fg_item}
+	visited_fg_items = set()
+	while fg_items:
+		visited_fg_items.update(fg_items)
+		items = frappe.get_all(
+			"BOM Creator Item",
+			filters={"parent": kwargs.parent, "fg_item": ["in", list(fg_items)]},
+			fields=["name", "item_code", "is_expandable"],
+		)
+
+		items_to_delete.extend(item.name for item in items)
+		fg_items = {
+			item.item_code
+			for item in items
+			if item.is_expandable and item.item_code not in visited_fg_items
+		}
 
-	for item in items:
-		frappe.delete_doc("BOM Creator Item", item.name)
-		if item.expandable:
-			delete_node(fg_item=item.value, parent=item.parent_id)
+	if items_to_delete:
+		frappe.db.delete("BOM Creator Item", {"name": ("in", items_to_delete)})
 
 	doc = frappe.get_doc("BOM Creator", kwargs.parent)
 	doc.set_rate_for_items()
@@ -429,9 +524,16 @@ def delete_node(**kwargs):
 
 @frappe.whitelist()
 def edit_qty(doctype, docname, qty, parent):
-	frappe.db.set_value(doctype, docname, "qty", qty)
 	doc = frappe.get_doc("BOM Creator", parent)
-	doc.set_rate_for_items()
-	doc.save()
+	doc.check_permission("write")
+	if doc.docstatus != 0:
+		frappe.throw(_("Quantities can only be edited in a draft BOM Creator"))
+
+	row = doc.get("items", {"name": docname})
+	if not row:
+		frappe.throw(_("Row {0} does not belong to BOM Creator {1}").format(docname, parent))
+
+	row[0].db_set("qty", flt(qty))
+	doc.update_amount_for_row(docname)
 
 	return doc
@@ -114,6 +114,64 @@ class TestBOMCreator(FrappeTestCase):
 
 		self.assertEqual(doc.raw_material_cost, fg_valuation_rate)
 
+	def test_edit_qty_recosts_parent_rows(self):
+		final_product = "Bicycle"
+		make_item(
+			final_product,
+			{
+				"item_group": "Raw Material",
+				"stock_uom": "Nos",
+			},
+		)
+
+		doc = make_bom_creator(
+			name="Bicycle BOM with Edited Qty",
+			company="_Test Company",
+			item_code=final_product,
+			qty=1,
+			rm_cosy_as_per="Valuation Rate",
+			currency="INR",
+			plc_conversion_rate=1,
+			conversion_rate=1,
+		)
+
+		add_sub_assembly(
+			parent=doc.name,
+			fg_item=final_product,
+			fg_reference_id=doc.name,
+			bom_item={
+				"item_code": "Frame Assembly",
+				"qty": 1,
+				"items": [
+					{
+						"item_code": "Frame",
+						"qty": 1,
+					},
+					{
+						"item_code": "Fork",
+						"qty": 1,
+					},
+				],
+			},
+		)
+
+		doc.reload()
+		frame = next(row for row in doc.items if row.item_code == "Frame")
+		edit_qty(doctype="BOM Creator Item", docname=frame.name, qty=3, parent=doc.name)
+
+		doc.reload()
+		sub_assembly = doc.items[0]
+		frame = next(row for row in doc.items if row.item_code == "Frame")
+		self.assertEqual(frame.qty, 3)
+		self.assertEqual(frame.amount, frame.rate * 3)
+
+		components_amount = sum(
+			row.amount for row in doc.items if row.fg_reference_id == sub_assembly.name
+		)
+		self.assertEqual(sub_assembly.amount, components_amount)
+		self.assertEqual(sub_assembly.rate, components_amount)
+		self.assertEqual(doc.raw_material_cost, sub_assembly.amount)
+
 	def test_convert_to_sub_assembly(self):
 		final_product = "Bicycle"
 		make_item(
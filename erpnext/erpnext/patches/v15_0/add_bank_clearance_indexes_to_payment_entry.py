@@ -0,0 +1,5 @@
+from erpnext.accounts.doctype.payment_entry.payment_entry import on_doctype_update
+
+
+def execute():
+	on_doctype_update()
@@ -10,7 +10,7 @@ from erpnext.setup.setup_wizard.operations import install_fixtures as fixtures
 
 
 def get_setup_stages(args=None):
-	if frappe.db.sql("select name from tabCompany"):
+	if frappe.db.a_row_exists("Company"):
 		stages = [
 			{
 				"status": _("Wrapping up"),
@@ -81,7 +81,10 @@ def login_as_first_user(args):
 
 # Only for programmatical use
 def setup_complete(args=None):
-	stage_fixtures(args)
-	setup_company(args)
-	setup_defaults(args)
+	# same as get_setup_stages, once a company exists only the wrap up is left to do
+	if not frappe.db.a_row_exists("Company"):
+		stage_fixtures(args)
+		setup_company(args)
+		setup_defaults(args)
+
 	fin(args)
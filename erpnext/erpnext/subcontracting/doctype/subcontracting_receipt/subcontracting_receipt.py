@@ -1,6 +1,9 @@
 # Copyright (c) 2022, Frappe Technologies Pvt. Ltd. and contributors
 # For license information, please see license.txt
 
+from collections import defaultdict
+from functools import cached_property
+
 import frappe
 from frappe import _
 from frappe.utils import cint, flt, getdate, nowdate
@@ -29,14 +32,15 @@ class SubcontractingReceipt(SubcontractingController):
 			},
 		]
 
-	def onload(self):
-		self.set_onload(
-			"backflush_based_on",
-			frappe.db.get_single_value(
-				"Buying Settings", "backflush_raw_materials_of_subcontract_based_on"
-			),
+	@cached_property
+	def backflush_raw_materials_based_on(self):
+		return frappe.get_cached_value(
+			"Buying Settings", "Buying Settings", "backflush_raw_materials_of_subcontract_based_on"
 		)
 
+	def onload(self):
+		self.set_onload("backflush_based_on", self.backflush_raw_materials_based_on)
+
 	def before_validate(self):
 		super(SubcontractingReceipt, self).before_validate()
 		self.validate_items_qty()
@@ -66,10 +70,22 @@ class SubcontractingReceipt(SubcontractingController):
 			self.validate_accepted_warehouse()
 			self.validate_rejected_warehouse()
 
-		self.reset_default_field_value("set_warehouse", "items", "warehouse")
-		self.reset_default_field_value("rejected_warehouse", "items", "rejected_warehouse")
+		self.reset_default_warehouses()
 		self.get_current_stock()
 
+	def reset_default_warehouses(self):
+		"""`reset_default_field_value` for both warehouse defaults in one pass."""
+		warehouses, rejected_warehouses = set(), set()
+		for item in self.items:
+			warehouses.add(item.warehouse)
+			rejected_warehouses.add(item.rejected_warehouse)
+
+		if len(warehouses) > 1:
+			self.set_warehouse = None
+
+		if len(rejected_warehouses) > 1:
+			self.rejected_warehouse = None
+
 	def on_submit(self):
 		self.validate_available_qty_for_consumption()
 		self.update_status_updater_args()
@@ -112,21 +128,26 @@ class SubcontractingReceipt(SubcontractingController):
 
 	def set_items_bom(self):
 		if self.is_return:
-			for item in self.items:
-				if not item.bom:
-					item.bom = frappe.db.get_value(
-						"Subcontracting Receipt Item",
-						{"name": item.subcontracting_receipt_item, "parent": self.return_against},
-						"bom",
-					)
+			doctype, reference_field = "Subcontracting Receipt Item", "subcontracting_receipt_item"
 		else:
-			for item in self.items:
-				if not item.bom:
-					item.bom = frappe.db.get_value(
-						"Subcontracting Order Item",
-						{"name": item.subcontracting_order_item, "parent": item.subcontracting_order},
-						"bom",
-					)
+			doctype, reference_field = "Subcontracting Order Item", "subcontracting_order_item"
+
+		items = [item for item in self.items if not item.bom]
+		references = {item.get(reference_field) for item in items if item.get(reference_field)}
+		if not references:
+			return
+
+		# fetch the BOMs of all the referenced rows at once, keyed like the old per-row filter
+		boms = {
+			(d.name, d.parent): d.bom
+			for d in frappe.get_all(
+				doctype, filters={"name": ["in", list(references)]}, fields=["name", "parent", "bom"]
+			)
+		}
+
+		for item in items:
+			parent = self.return_against if self.is_return else item.subcontracting_order
+			item.bom = boms.get((item.get(reference_field), parent))
 
 	def set_items_cost_center(self):
 		if self.company:
@@ -145,34 +166,37 @@ class SubcontractingReceipt(SubcontractingController):
 					item.expense_account = expense_account
 
 	def reset_supplied_items(self):
-		if (
-			frappe.db.get_single_value("Buying Settings", "backflush_raw_materials_of_subcontract_based_on")
-			== "BOM"
-		):
+		if self.backflush_raw_materials_based_on == "BOM":
 			self.supplied_items = []
 
 	@frappe.whitelist()
 	def get_scrap_items(self, recalculate_rate=False):
 		self.remove_scrap_items()
 
-		for item in list(self.items):
+		bom_scrap_items = get_bom_scrap_items({item.bom for item in self.items if item.bom})
+		company_currency = erpnext.get_company_currency(self.company)
+
+		# every argument but the item is the same for the whole receipt
+		valuation_rates = {}
+
+		scrap_items = []
+		for item in self.items:
 			if item.bom:
-				bom = frappe.get_doc("BOM", item.bom)
-				for scrap_item in bom.scrap_items:
-					qty = flt(item.qty) * (flt(scrap_item.stock_qty) / flt(bom.quantity))
-					rate = (
-						get_valuation_rate(
+				for scrap_item in bom_scrap_items.get(item.bom, []):
+					qty = flt(item.qty) * scrap_item.qty_per_unit
+
+					if scrap_item.item_code not in valuation_rates:
+						valuation_rates[scrap_item.item_code] = get_valuation_rate(
 							scrap_item.item_code,
 							self.set_warehouse,
 							self.doctype,
 							self.name,
-							currency=erpnext.get_company_currency(self.company),
+							currency=company_currency,
 							company=self.company,
 						)
-						or scrap_item.rate
-					)
-					self.append(
-						"items",
+
+					rate = valuation_rates[scrap_item.item_code] or scrap_item.rate
+					scrap_items.append(
 						{
 							"is_scrap_item": 1,
 							"reference_name": item.name,
@@ -188,19 +212,22 @@ class SubcontractingReceipt(SubcontractingController):
 							"amount": qty * rate,
 							"warehouse": self.set_warehouse,
 							"rejected_warehouse": self.rejected_warehouse,
-						},
+						}
 					)
 
+		self.extend("items", scrap_items)
+
 		if recalculate_rate:
 			self.calculate_additional_costs()
 			self.calculate_items_qty_and_amount()
 
 	def remove_scrap_items(self, recalculate_rate=False):
-		for item in list(self.items):
-			if item.is_scrap_item:
-				self.remove(item)
-			else:
-				item.scrap_cost_per_qty = 0
+		items = [item for item in self.items if not item.is_scrap_item]
+		for idx, item in enumerate(items, 1):
+			item.idx = idx
+			item.scrap_cost_per_qty = 0
+
+		self.items = items
 
 		if recalculate_rate:
 			self.calculate_items_qty_and_amount()
@@ -214,83 +241,95 @@ class SubcontractingReceipt(SubcontractingController):
 	def set_available_qty_for_consumption(self):
 		supplied_items_details = {}
 
-		sco_supplied_item = frappe.qb.DocType("Subcontracting Order Supplied Item")
-		for item in self.get("items"):
+		subcontracting_orders = {
+			item.subcontracting_order for item in self.get("items") if item.subcontracting_order
+		}
+		if subcontracting_orders:
+			sco_supplied_item = frappe.qb.DocType("Subcontracting Order Supplied Item")
 			supplied_items = (
 				frappe.qb.from_(sco_supplied_item)
 				.select(
+					sco_supplied_item.parent,
+					sco_supplied_item.main_item_code,
 					sco_supplied_item.rm_item_code,
 					sco_supplied_item.reference_name,
 					(sco_supplied_item.total_supplied_qty - sco_supplied_item.consumed_qty).as_("available_qty"),
 				)
-				.where(
-					(sco_supplied_item.parent == item.subcontracting_order)
-					& (sco_supplied_item.main_item_code == item.item_code)
-					& (sco_supplied_item.reference_name == item.subcontracting_order_item)
-				)
+				.where(sco_supplied_item.parent.isin(list(subcontracting_orders)))
 			).run(as_dict=True)
 
-			if supplied_items:
-				supplied_items_details[item.name] = {}
+			available_qty_map = {}
+			for supplied_item in supplied_items:
+				key = (supplied_item.parent, supplied_item.main_item_code, supplied_item.reference_name)
+				available_qty_map.setdefault(key, []).append(supplied_item)
 
-				for supplied_item in supplied_items:
-					supplied_items_details[item.name][supplied_item.rm_item_code] = supplied_item.available_qty
-		else:
-			for item in self.get("supplied_items"):
-				item.available_qty_for_consumption = supplied_items_details.get(item.reference_name, {}).get(
-					item.rm_item_code, 0
-				)
+			for item in self.get("items"):
+				key = (item.subcontracting_order, item.item_code, item.subcontracting_order_item)
+				if key in available_qty_map:
+					supplied_items_details[item.name] = {
+						supplied_item.rm_item_code: supplied_item.available_qty
+						for supplied_item in available_qty_map[key]
+					}
+
+		for item in self.get("supplied_items"):
+			item.available_qty_for_consumption = supplied_items_details.get(item.reference_name, {}).get(
+				item.rm_item_code, 0
+			)
 
 	def calculate_items_qty_and_amount(self):
-		rm_cost_map = {}
+		rm_cost_map = defaultdict(float)
 		for item in self.get("supplied_items") or []:
 			item.amount = flt(item.consumed_qty) * flt(item.rate)
+			rm_cost_map[item.reference_name] += item.amount
 
-			if item.reference_name in rm_cost_map:
-				rm_cost_map[item.reference_name] += item.amount
-			else:
-				rm_cost_map[item.reference_name] = item.amount
-
-		scrap_cost_map = {}
+		# scrap rows are costed in the same pass that splits them from the finished goods,
+		# the finished goods need the complete scrap cost of their row so they follow after
+		scrap_cost_map = defaultdict(float)
+		finished_goods = []
+		total_qty = total_amount = 0
 		for item in self.get("items") or []:
-			if item.is_scrap_item:
-				item.amount = flt(item.qty) * flt(item.rate)
+			if not item.is_scrap_item:
+				finished_goods.append(item)
+				continue
+
+			qty = flt(item.qty)
+			item.amount = qty * flt(item.rate)
+			scrap_cost_map[item.reference_name] += item.amount
+
+			item.received_qty = qty + flt(item.rejected_qty)
+
+			total_qty += qty
+			total_amount += item.amount
 
-				if item.reference_name in scrap_cost_map:
-					scrap_cost_map[item.reference_name] += item.amount
+		for item in finished_goods:
+			qty = flt(item.qty)
+			if qty:
+				if item.name in rm_cost_map:
+					item.rm_supp_cost = rm_cost_map[item.name]
+					item.rm_cost_per_qty = item.rm_supp_cost / item.qty
+					rm_cost_map.pop(item.name)
+
+				if item.name in scrap_cost_map:
+					item.scrap_cost_per_qty = scrap_cost_map[item.name] / item.qty
+					scrap_cost_map.pop(item.name)
 				else:
-					scrap_cost_map[item.reference_name] = item.amount
+					item.scrap_cost_per_qty = 0
 
-		total_qty = total_amount = 0
-		for item in self.get("items") or []:
-			if not item.is_scrap_item:
-				if item.qty:
-					if item.name in rm_cost_map:
-						item.rm_supp_cost = rm_cost_map[item.name]
-						item.rm_cost_per_qty = item.rm_supp_cost / item.qty
-						rm_cost_map.pop(item.name)
-
-					if item.name in scrap_cost_map:
-						item.scrap_cost_per_qty = scrap_cost_map[item.name] / item.qty
-						scrap_cost_map.pop(item.name)
-					else:
-						item.scrap_cost_per_qty = 0
-
-				item.rate = (
-					flt(item.rm_cost_per_qty)
-					+ flt(item.service_cost_per_qty)
-					+ flt(item.additional_cost_per_qty)
-					- flt(item.scrap_cost_per_qty)
-				)
+			item.rate = (
+				flt(item.rm_cost_per_qty)
+				+ flt(item.service_cost_per_qty)
+				+ flt(item.additional_cost_per_qty)
+				- flt(item.scrap_cost_per_qty)
+			)
 
-			item.received_qty = flt(item.qty) + flt(item.rejected_qty)
-			item.amount = flt(item.qty) * flt(item.rate)
+			item.received_qty = qty + flt(item.rejected_qty)
+			item.amount = qty * flt(item.rate)
 
-			total_qty += flt(item.qty)
+			total_qty += qty
 			total_amount += item.amount
-		else:
-			self.total_qty = total_qty
-			self.total = total_amount
+
+		self.total_qty = total_qty
+		self.total = total_amount
 
 	def validate_scrap_items(self):
 		for item in self.items:
@@ -332,8 +371,11 @@ class SubcontractingReceipt(SubcontractingController):
 				)
 
 	def validate_available_qty_for_consumption(self):
-		for item in self.get("supplied_items"):
-			precision = item.precision("consumed_qty")
+		if not self.get("supplied_items"):
+			return
+
+		precision = self.precision("consumed_qty", "supplied_items")
+		for item in self.supplied_items:
 			if (
 				item.available_qty_for_consumption
 				and flt(item.available_qty_for_consumption, precision) - flt(item.consumed_qty, precision) < 0
@@ -374,29 +416,47 @@ class SubcontractingReceipt(SubcontractingController):
 
 	def update_status(self, status=None, update_modified=False):
 		if not status:
-			if self.docstatus == 0:
-				status = "Draft"
-			elif self.docstatus == 1:
-				status = "Completed"
-
-				if self.is_return:
-					status = "Return"
-				elif self.per_returned == 100:
-					status = "Return Issued"
-
-			elif self.docstatus == 2:
-				status = "Cancelled"
+			status = get_receipt_status(self.docstatus, self.is_return, self.per_returned)
 
 			if self.is_return:
-				frappe.get_doc("Subcontracting Receipt", self.return_against).update_status(
-					update_modified=update_modified
+				return_against = frappe.db.get_value(
+					"Subcontracting Receipt",
+					self.return_against,
+					["docstatus", "is_return", "per_returned"],
+					as_dict=True,
 				)
+				if return_against_status := get_receipt_status(**return_against):
+					frappe.db.set_value(
+						"Subcontracting Receipt",
+						self.return_against,
+						"status",
+						return_against_status,
+						update_modified=update_modified,
+					)
 
 		if status:
 			frappe.db.set_value(
 				"Subcontracting Receipt", self.name, "status", status, update_modified=update_modified
 			)
 
+	def get_stock_value_differences(self):
+		"""Returns {(voucher_detail_no, warehouse): stock_value_difference} for this receipt's SLEs"""
+		stock_value_differences = {}
+		for d in frappe.get_all(
+			"Stock Ledger Entry",
+			filters={
+				"voucher_type": "Subcontracting Receipt",
+				"voucher_no": self.name,
+				"is_cancelled": 0,
+			},
+			fields=["voucher_detail_no", "warehouse", "stock_value_difference"],
+		):
+			stock_value_differences.setdefault(
+				(d.voucher_detail_no, d.warehouse), d.stock_value_difference
+			)
+
+		return stock_value_differences
+
 	def get_gl_entries(self, warehouse_account=None):
 		from erpnext.accounts.general_ledger import process_gl_map
 
@@ -413,29 +473,22 @@ class SubcontractingReceipt(SubcontractingController):
 		expenses_included_in_valuation = self.get_company_default("expenses_included_in_valuation")
 
 		warehouse_with_no_account = []
+		stock_value_differences = self.get_stock_value_differences()
+
+		# the same for every row
+		supplier_warehouse_account = warehouse_account.get(self.supplier_warehouse, {}).get("account")
+		supplier_warehouse_account_currency = warehouse_account.get(self.supplier_warehouse, {}).get(
+			"account_currency"
+		)
+		remarks = self.get("remarks") or _("Accounting Entry for Stock")
 
 		for item in self.items:
 			if flt(item.rate) and flt(item.qty):
 				if warehouse_account.get(item.warehouse):
-					stock_value_diff = frappe.db.get_value(
-						"Stock Ledger Entry",
-						{
-							"voucher_type": "Subcontracting Receipt",
-							"voucher_no": self.name,
-							"voucher_detail_no": item.name,
-							"warehouse": item.warehouse,
-							"is_cancelled": 0,
-						},
-						"stock_value_difference",
-					)
+					stock_value_diff = stock_value_differences.get((item.name, item.warehouse))
 
 					warehouse_account_name = warehouse_account[item.warehouse]["account"]
 					warehouse_account_currency = warehouse_account[item.warehouse]["account_currency"]
-					supplier_warehouse_account = warehouse_account.get(self.supplier_warehouse, {}).get("account")
-					supplier_warehouse_account_currency = warehouse_account.get(self.supplier_warehouse, {}).get(
-						"account_currency"
-					)
-					remarks = self.get("remarks") or _("Accounting Entry for Stock")
 
 					# FG Warehouse Account (Debit)
 					self.add_gl_entry(
@@ -506,22 +559,25 @@ class SubcontractingReceipt(SubcontractingController):
 					warehouse_with_no_account.append(item.warehouse)
 
 		# Additional Costs Expense Accounts (Credit)
-		for row in self.additional_costs:
-			credit_amount = (
-				flt(row.base_amount)
-				if (row.base_amount or row.account_currency != self.company_currency)
-				else flt(row.amount)
-			)
+		if self.additional_costs:
+			cost_center = self.cost_center or self.get_company_default("cost_center")
+
+			for row in self.additional_costs:
+				credit_amount = (
+					flt(row.base_amount)
+					if (row.base_amount or row.account_currency != self.company_currency)
+					else flt(row.amount)
+				)
 
-			self.add_gl_entry(
-				gl_entries=gl_entries,
-				account=row.expense_account,
-				cost_center=self.cost_center or self.get_company_default("cost_center"),
-				debit=0.0,
-				credit=credit_amount,
-				remarks=remarks,
-				against_account=None,
-			)
+				self.add_gl_entry(
+					gl_entries=gl_entries,
+					account=row.expense_account,
+					cost_center=cost_center,
+					debit=0.0,
+					credit=credit_amount,
+					remarks=remarks,
+					against_account=None,
+				)
 
 		if warehouse_with_no_account:
 			frappe.msgprint(
@@ -531,6 +587,44 @@ class SubcontractingReceipt(SubcontractingController):
 			)
 
 
+def get_receipt_status(docstatus, is_return, per_returned):
+	if docstatus == 0:
+		return "Draft"
+	elif docstatus == 1:
+		if is_return:
+			return "Return"
+		elif per_returned == 100:
+			return "Return Issued"
+		return "Completed"
+	elif docstatus == 2:
+		return "Cancelled"
+
+
+def get_bom_scrap_items(boms):
+	"""Returns {bom: [scrap items]} for the given BOMs with two queries.
+
+	Each scrap item carries `qty_per_unit`, its stock qty per unit of the BOM's quantity."""
+	if not boms:
+		return {}
+
+	boms = list(boms)
+	bom_quantity = dict(
+		frappe.get_all("BOM", filters={"name": ["in", boms]}, fields=["name", "quantity"], as_list=True)
+	)
+
+	bom_scrap_items = {}
+	for d in frappe.get_all(
+		"BOM Scrap Item",
+		filters={"parent": ["in", boms], "parenttype": "BOM", "parentfield": "scrap_items"},
+		fields=["parent", "item_code", "item_name", "stock_qty", "rate", "stock_uom"],
+		order_by="parent, idx",
+	):
+		d.qty_per_unit = flt(d.stock_qty) / flt(bom_quantity[d.parent])
+		bom_scrap_items.setdefault(d.parent, []).append(d)
+
+	return bom_scrap_items
+
+
 @frappe.whitelist()
 def make_subcontract_return(source_name, target_doc=None):
 	from erpnext.controllers.sales_and_purchase_return import make_return_doc
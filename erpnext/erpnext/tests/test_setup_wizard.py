@@ -0,0 +1,26 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext.setup.setup_wizard import setup_wizard
+
+
+class TestSetupWizard(FrappeTestCase):
+	def test_setup_complete_with_existing_company(self):
+		self.assertTrue(frappe.db.a_row_exists("Company"))
+
+		with patch.multiple(
+			setup_wizard,
+			stage_fixtures=patch.DEFAULT,
+			setup_company=patch.DEFAULT,
+			setup_defaults=patch.DEFAULT,
+			fin=patch.DEFAULT,
+		) as mocks:
+			setup_wizard.setup_complete({})
+
+		# fixtures, company and defaults are already installed, only the wrap up runs
+		mocks["stage_fixtures"].assert_not_called()
+		mocks["setup_company"].assert_not_called()
+		mocks["setup_defaults"].assert_not_called()
+		mocks["fin"].assert_called_once()
@@ -1,8 +1,12 @@
 # Copyright (c) 2015, Frappe Technologies Pvt. Ltd. and Contributors
 # License: MIT. See LICENSE
 
+from pypika.terms import Criterion
+from pypika.utils import format_alias_sql
+
 import frappe
 from frappe.model.document import Document
+from frappe.query_builder.terms import ParameterizedValueWrapper
 
 desk_properties = (
 	"search_bar",
@@ -79,13 +83,26 @@ class Role(Document):
 		"""update system user desk access if this has changed in this update"""
 		if frappe.flags.in_install:
 			return
-		if self.has_value_changed("desk_access"):
-			for user_name in get_users(self.name):
-				user = frappe.get_doc("User", user_name)
-				user_type = user.user_type
-				user.set_system_user()
-				if user_type != user.user_type:
-					user.save()
+		if not self.has_value_changed("desk_access"):
+			return
+
+		# granting desk access can only turn website users into system users and revoking it
+		# only the reverse, custom user types don't depend on desk access at all
+		affected_user_type = "Website User" if self.desk_access else "System User"
+		users = frappe.get_all(
+			"User",
+			filters={"name": ("in", get_users(self.name))},
+			fields=["name", "user_type"],
+		)
+		for d in users:
+			if d.user_type and d.user_type != affected_user_type:
+				continue
+
+			user = frappe.get_doc("User", d.name)
+			user_type = user.user_type
+			user.set_system_user()
+			if user_type != user.user_type:
+				user.save()
 
 
 def get_info_based_on_role(role, field="email", ignore_permissions=False):
@@ -103,11 +120,23 @@ def get_info_based_on_role(role, field="email", ignore_permissions=False):
 
 def get_user_info(users, field="email"):
 	"""Fetch details about users for the specified field"""
+	user_names = [user.get("user_name") for user in users]
+	user_info = dict(
+		frappe.get_all(
+			"User",
+			filters={"name": ("in", user_names), "enabled": 1},
+			fields=["name", field],
+			as_list=True,
+		)
+	)
+
 	info_list = []
-	for user in users:
-		user_info, enabled = frappe.db.get_value("User", user.get("user_name"), [field, "enabled"])
-		if enabled and user_info not in ["admin@example.com", "guest@example.com"]:
-			info_list.append(user_info)
+	for user_name in user_names:
+		if user_name in user_info and user_info[user_name] not in [
+			"admin@example.com",
+			"guest@example.com",
+		]:
+			info_list.append(user_info[user_name])
 	return info_list
 
 
@@ -124,10 +153,36 @@ def get_users(role):
 @frappe.whitelist()
 @frappe.validate_and_sanitize_search_inputs
 def role_query(doctype, txt, searchfield, start, page_len, filters):
-	report_filters = [["Role", "name", "like", f"%{txt}%"], ["Role", "is_custom", "=", 0]]
+	role = frappe.qb.DocType("Role")
+	# match what was typed literally, % and _ are not wildcards here
+	txt = (txt or "").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+	report_filters = [_LikeWithEscape(role.name, f"%{txt}%"), ["Role", "is_custom", "=", 0]]
 	if filters and isinstance(filters, list):
 		report_filters.extend(filters)
 
-	return frappe.get_all(
-		"Role", limit_start=start, limit_page_length=page_len, filters=report_filters, as_list=1
-	)
+	return frappe.qb.get_query(
+		"Role",
+		fields=["name"],
+		filters=report_filters,
+		limit=page_len,
+		offset=start,
+		validate_filters=True,
+	).run(as_list=1)
+
+
+class _LikeWithEscape(Criterion):
+	"""`term LIKE pattern ESCAPE '\\'` with both values passed as query parameters"""
+
+	def __init__(self, term, pattern, alias=None):
+		super().__init__(alias)
+		self.term = term
+		self.pattern = ParameterizedValueWrapper(pattern)
+		self.escape_char = ParameterizedValueWrapper("\\")
+
+	def get_sql(self, **kwargs):
+		sql = "{term} LIKE {pattern} ESCAPE {escape_char}".format(
+			term=self.term.get_sql(**kwargs),
+			pattern=self.pattern.get_sql(**kwargs),
+			escape_char=self.escape_char.get_sql(**kwargs),
+		)
+		return format_alias_sql(sql, self.alias, **kwargs)
@@ -2,7 +2,7 @@
 # License: MIT. See LICENSE
 
 import frappe
-from frappe.core.doctype.role.role import get_info_based_on_role
+from frappe.core.doctype.role.role import get_info_based_on_role, role_query
 from frappe.tests.utils import FrappeTestCase
 
 test_records = frappe.get_test_records("Role")
@@ -52,3 +52,15 @@ class TestUser(FrappeTestCase):
 
 		for user in sys_managers:
 			self.assertIn(role, frappe.get_roles(user))
+
+	def test_role_query_matches_wildcards_literally(self):
+		for role_name in ("_Test Role_Wildcard", "_Test Role%Wildcard", "_Test RoleXWildcard"):
+			if not frappe.db.exists("Role", role_name):
+				frappe.get_doc(dict(doctype="Role", role_name=role_name)).insert()
+
+		def search(txt):
+			return [row[0] for row in role_query("Role", txt, "name", 0, 20, None)]
+
+		self.assertEqual(search("Role_Wildcard"), ["_Test Role_Wildcard"])
+		self.assertEqual(search("Role%Wildcard"), ["_Test Role%Wildcard"])
+		self.assertEqual(search("RoleXWildcard"), ["_Test RoleXWildcard"])
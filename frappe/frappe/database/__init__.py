@@ -4,49 +4,38 @@
 # Database Module
 # --------------------
 
+import importlib
+
 from frappe.database.database import savepoint
 
 
 def setup_database(force, source_sql=None, verbose=None, no_mariadb_socket=False):
 	import frappe
 
+	setup_db = _get_backend_module(frappe.conf.db_type, "setup_db")
 	if frappe.conf.db_type == "postgres":
-		import frappe.database.postgres.setup_db
-
-		return frappe.database.postgres.setup_db.setup_database(force, source_sql, verbose)
+		return setup_db.setup_database(force, source_sql, verbose)
 	else:
-		import frappe.database.mariadb.setup_db
-
-		return frappe.database.mariadb.setup_db.setup_database(
-			force, source_sql, verbose, no_mariadb_socket=no_mariadb_socket
-		)
+		return setup_db.setup_database(force, source_sql, verbose, no_mariadb_socket=no_mariadb_socket)
 
 
 def drop_user_and_database(db_name, root_login=None, root_password=None):
 	import frappe
 
-	if frappe.conf.db_type == "postgres":
-		import frappe.database.postgres.setup_db
-
-		return frappe.database.postgres.setup_db.drop_user_and_database(
-			db_name, root_login, root_password
-		)
-	else:
-		import frappe.database.mariadb.setup_db
-
-		return frappe.database.mariadb.setup_db.drop_user_and_database(
-			db_name, root_login, root_password
-		)
+	setup_db = _get_backend_module(frappe.conf.db_type, "setup_db")
+	return setup_db.drop_user_and_database(db_name, root_login, root_password)
 
 
 def get_db(host=None, user=None, password=None, port=None):
 	import frappe
 
+	database = _get_backend_module(frappe.conf.db_type, "database")
 	if frappe.conf.db_type == "postgres":
-		import frappe.database.postgres.database
-
-		return frappe.database.postgres.database.PostgresDatabase(host, user, password, port=port)
+		return database.PostgresDatabase(host, user, password, port=port)
 	else:
-		import frappe.database.mariadb.database
+		return database.MariaDBDatabase(host, user, password, port=port)
+
 
-		return frappe.database.mariadb.database.MariaDBDatabase(host, user, password, port=port)
+def _get_backend_module(db_type, module):
+	backend = "postgres" if db_type == "postgres" else "mariadb"
+	return importlib.import_module(f"frappe.database.{backend}.{module}")
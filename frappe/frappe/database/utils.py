@@ -2,7 +2,7 @@
 # License: MIT. See LICENSE
 
 import typing
-from functools import cached_property
+from functools import cached_property, lru_cache
 from types import NoneType
 
 import frappe
@@ -35,6 +35,7 @@ def is_pypika_function_object(field: str) -> bool:
 	return getattr(field, "__module__", None) == "pypika.functions" or isinstance(field, Function)
 
 
+@lru_cache(maxsize=4096)
 def get_doctype_name(table_name: str) -> str:
 	if table_name.startswith(("tab", "`tab", '"tab')):
 		table_name = table_name.replace("tab", "", 1)
@@ -53,6 +54,9 @@ class LazyString:
 	def __str__(self) -> str:
 		return self.value
 
+	def __format__(self, format_spec: str) -> str:
+		return format(self.value, format_spec)
+
 	def __repr__(self) -> str:
 		return f"'{self.value}'"
 
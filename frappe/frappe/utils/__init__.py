@@ -443,11 +443,12 @@ def unesc(s, esc_chars):
 
 def execute_in_shell(cmd, verbose=False, low_priority=False, check_exit_code=False):
 	# using Popen instead of os.system - as recommended by python docs
+	# an argument list is executed directly, without a shell in between
 	import tempfile
 	from subprocess import Popen
 
 	with (tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr):
-		kwargs = {"shell": True, "stdout": stdout, "stderr": stderr}
+		kwargs = {"shell": isinstance(cmd, str), "stdout": stdout, "stderr": stderr}
 
 		if low_priority:
 			kwargs["preexec_fn"] = lambda: os.nice(10)
@@ -2,12 +2,14 @@
 # License: MIT. See LICENSE
 
 # imports - standard imports
+import fnmatch
 import gzip
 import os
-from calendar import timegm
+import subprocess
 from datetime import datetime
-from glob import glob
-from shutil import which
+from functools import cached_property
+from shutil import copyfile, which
+from stat import S_ISREG
 
 # imports - third party imports
 import click
@@ -142,6 +144,10 @@ class BackupGenerator:
 
 		self.partial = (self.backup_includes or self.backup_excludes) and not self.ignore_conf
 
+	@cached_property
+	def encrypt_backup(self) -> bool:
+		return bool(frappe.get_system_settings("encrypt_backup"))
+
 	@property
 	def site_config_backup_path(self):
 		# For backwards compatibility
@@ -188,7 +194,7 @@ class BackupGenerator:
 			if not ignore_files:
 				self.backup_files()
 
-			if frappe.get_system_settings("encrypt_backup"):
+			if self.encrypt_backup:
 				self.backup_encryption()
 
 		else:
@@ -200,7 +206,7 @@ class BackupGenerator:
 	def set_backup_file_name(self):
 		partial = "-partial" if self.partial else ""
 		ext = "tgz" if self.compress_files else "tar"
-		enc = "-enc" if frappe.get_system_settings("encrypt_backup") else ""
+		enc = "-enc" if self.encrypt_backup else ""
 		self.todays_date = now_datetime().strftime("%Y%m%d_%H%M%S")
 
 		for_conf = f"{self.todays_date}-{self.site_slug}-site_config_backup{enc}.json"
@@ -222,29 +228,38 @@ class BackupGenerator:
 		"""
 		Encrypt all the backups created using gpg.
 		"""
+		from concurrent.futures import ThreadPoolExecutor
+
 		paths = (self.backup_path_db, self.backup_path_files, self.backup_path_private_files)
-		for path in paths:
-			if os.path.exists(path):
-				cmd_string = "gpg --yes --passphrase {passphrase} --pinentry-mode loopback -c {filelocation}"
-				try:
-					command = cmd_string.format(
-						passphrase=get_or_generate_backup_encryption_key(),
-						filelocation=path,
-					)
-
-					frappe.utils.execute_in_shell(command)
-					os.rename(path + ".gpg", path)
-
-				except Exception as err:
-					print(err)
-					click.secho(
-						"Error occurred during encryption. Files are stored without encryption.", fg="red"
-					)
+		paths = [path for path in paths if os.path.exists(path)]
+		if not paths:
+			return
+
+		# resolved before spawning workers, generating a missing key concurrently would race
+		passphrase = get_or_generate_backup_encryption_key()
+
+		def encrypt(path):
+			# the passphrase goes through stdin so it never shows up in the process list
+			command = ["gpg", "--batch", "--yes", "--passphrase-fd", "0", "--pinentry-mode", "loopback"]
+			try:
+				subprocess.run([*command, "-c", path], input=passphrase, text=True, check=True)
+				os.rename(path + ".gpg", path)
+
+			except Exception as err:
+				print(err)
+				click.secho(
+					"Error occurred during encryption. Files are stored without encryption.", fg="red"
+				)
+
+		# gpg does the work in its own process, so the files are encrypted in parallel
+		with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+			# consume the results so an error raised in a worker is not lost
+			list(executor.map(encrypt, paths))
 
 	def get_recent_backup(self, older_than, partial=False):
 		backup_path = get_backup_path()
 
-		if not frappe.get_system_settings("encrypt_backup"):
+		if not self.encrypt_backup:
 			file_type_slugs = {
 				"database": "*-{{}}-{}database.sql.gz".format("*" if partial else ""),
 				"public": "*-{}-files.tar",
@@ -259,16 +274,16 @@ class BackupGenerator:
 				"config": "*-{}-site_config_backup.json",
 			}
 
-		def backup_time(file_path):
-			file_name = file_path.split(os.sep)[-1]
-			file_timestamp = file_name.split("-", 1)[0]
-			return timegm(datetime.strptime(file_timestamp, "%Y%m%d_%H%M%S").utctimetuple())
+		try:
+			file_names = os.listdir(backup_path)
+		except FileNotFoundError:
+			file_names = []
 
 		def get_latest(file_pattern):
-			file_pattern = os.path.join(backup_path, file_pattern.format(self.site_slug))
-			file_list = glob(file_pattern)
+			file_list = fnmatch.filter(file_names, file_pattern.format(self.site_slug))
 			if file_list:
-				return max(file_list, key=backup_time)
+				# names start with a fixed width %Y%m%d_%H%M%S timestamp, so they sort chronologically
+				return os.path.join(backup_path, max(file_list))
 
 		def old_enough(file_path):
 			if file_path:
@@ -339,17 +354,20 @@ class BackupGenerator:
 			print(template.format(_type.title(), info["path"], info["size"]))
 
 	def backup_files(self):
+		gzip_exc = self.get_gzip_command() if self.compress_files else None
+
 		for folder in ("public", "private"):
 			files_path = frappe.get_site_path(folder, "files")
 			backup_path = self.backup_path_files if folder == "public" else self.backup_path_private_files
 
 			if self.compress_files:
-				cmd_string = "self=$$; ( tar cf - {1} || kill $self ) | gzip > {0}"
+				cmd = f"self=$$; ( tar cf - {files_path} || kill $self ) | {gzip_exc} > {backup_path}"
 			else:
-				cmd_string = "tar -cf {0} {1}"
+				# no pipeline needed, run tar directly which also keeps paths with spaces intact
+				cmd = ["tar", "-cf", backup_path, files_path]
 
 			frappe.utils.execute_in_shell(
-				cmd_string.format(backup_path, files_path),
+				cmd,
 				verbose=self.verbose,
 				low_priority=True,
 				check_exit_code=True,
@@ -359,8 +377,7 @@ class BackupGenerator:
 		site_config_backup_path = self.backup_path_conf
 		site_config_path = os.path.join(frappe.get_site_path(), "site_config.json")
 
-		with open(site_config_backup_path, "w") as n, open(site_config_path) as c:
-			n.write(c.read())
+		copyfile(site_config_path, site_config_backup_path)
 
 	def get_db_dump_exeuctable(self) -> str:
 		db_exc, exists = None, False
@@ -384,25 +401,37 @@ class BackupGenerator:
 			)
 		return db_exc
 
-	def take_dump(self):
-		import frappe.utils
-		from frappe.utils.change_log import get_app_branch
+	def get_gzip_command(self) -> str:
+		"""Returns the command the dumps are piped through, preferring the multi-threaded pigz.
 
-		db_exc = self.get_db_dump_exeuctable()
-		gzip_exc = which("gzip")
+		Set `backup_compression_level` (1-9) in site config to trade backup size for speed."""
+		gzip_exc = which("pigz") or which("gzip")
 		if not gzip_exc:
 			frappe.throw(
 				"`gzip` not found in PATH! This is required to take a backup.", exc=frappe.ExecutableNotFound
 			)
 
+		if compression_level := cint(frappe.conf.backup_compression_level):
+			gzip_exc += f" -{compression_level}"
+
+		return gzip_exc
+
+	def take_dump(self):
+		import frappe.utils
+		from frappe.utils.change_log import get_app_branch
+
+		db_exc = self.get_db_dump_exeuctable()
+		gzip_exc = self.get_gzip_command()
+
 		database_header_content = [
 			f"Backup generated by Frappe {frappe.__version__} on branch {get_app_branch('frappe') or 'N/A'}",
 			"",
 		]
 
-		# escape reserved characters
+		# escape reserved characters of the values that go into the shell command
 		args = frappe._dict(
-			[item[0], frappe.utils.esc(str(item[1]), "$ ")] for item in self.__dict__.copy().items()
+			(key, frappe.utils.esc(str(getattr(self, key)), "$ "))
+			for key in ("user", "password", "db_host", "db_port", "db_name", "backup_path_db")
 		)
 
 		if self.backup_includes:
@@ -421,10 +450,11 @@ class BackupGenerator:
 				]
 			)
 
-		generated_header = "\n".join(f"-- {x}" for x in database_header_content) + "\n"
+		generated_header = "\n".join([f"-- {x}" for x in database_header_content]) + "\n"
 
-		with gzip.open(args.backup_path_db, "wt") as f:
-			f.write(generated_header)
+		# the dump is appended as further gzip members, which together form a valid gzip stream
+		with open(args.backup_path_db, "wb") as f:
+			f.write(gzip.compress(generated_header.encode()))
 
 		if self.db_type == "postgres":
 			if self.backup_includes:
@@ -606,11 +636,11 @@ def delete_temp_backups(older_than=24):
 	older_than = cint(frappe.conf.keep_backups_for_hours) or older_than
 	backup_path = get_backup_path()
 	if os.path.exists(backup_path):
-		file_list = os.listdir(get_backup_path())
-		for this_file in file_list:
-			this_file_path = os.path.join(get_backup_path(), this_file)
-			if is_file_old(this_file_path, older_than):
-				os.remove(this_file_path)
+		with os.scandir(backup_path) as entries:
+			for entry in entries:
+				# file type comes from the directory listing itself, and directories can't be removed
+				if entry.is_file() and is_file_old(entry.path, older_than):
+					os.remove(entry.path)
 
 
 def is_file_old(file_path, older_than=24):
@@ -620,11 +650,17 @@ def is_file_old(file_path, older_than=24):
 	True: file does not exist or file is old
 	False: file is new
 	"""
-	if os.path.isfile(file_path):
+	# a single stat serves both the existence check and the timestamp
+	try:
+		file_stat = os.stat(file_path)
+	except OSError:
+		file_stat = None
+
+	if file_stat and S_ISREG(file_stat.st_mode):
 		from datetime import timedelta
 
 		# Get timestamp of the file
-		file_datetime = datetime.fromtimestamp(os.stat(file_path).st_ctime)
+		file_datetime = datetime.fromtimestamp(file_stat.st_ctime)
 		if datetime.today() - file_datetime >= timedelta(hours=older_than):
 			if _verbose:
 				print(f"File {file_path} is older than {older_than} hours")
@@ -24,6 +24,25 @@ PDF_CONTENT_ERRORS = [
 	"RemoteHostClosedError",
 ]
 
+PDF_OPTION_PATTERNS = {
+	attr: re.compile(r"(\.print-format)([\S|\s][^}]*?)(" + attr + r":)(.+)(mm;)")
+	for attr in (
+		"margin-top",
+		"margin-bottom",
+		"margin-left",
+		"margin-right",
+		"page-size",
+		"header-spacing",
+		"orientation",
+		"page-width",
+		"page-height",
+	)
+}
+
+# {path: (mtime, contents)}
+_print_css_cache = {}
+_wkhtmltopdf_version = None
+
 logger = frappe.logger("wkhtmltopdf", max_size=100000, file_count=3)
 logger.setLevel("INFO")
 
@@ -111,22 +130,19 @@ def get_pdf(html, options=None, output: PdfWriter | None = None):
 	finally:
 		cleanup(options)
 
-	if "password" in options:
-		password = options["password"]
-
 	if output:
 		output.append_pages_from_reader(reader)
 		return output
 
+	# only encryption needs the pdf to be rewritten, otherwise wkhtmltopdf's output is final
+	if "password" not in options:
+		return filedata
+
 	writer = PdfWriter()
 	writer.append_pages_from_reader(reader)
+	writer.encrypt(options["password"])
 
-	if "password" in options:
-		writer.encrypt(password)
-
-	filedata = get_file_data_from_writer(writer)
-
-	return filedata
+	return get_file_data_from_writer(writer)
 
 
 def get_file_data_from_writer(writer_obj):
@@ -135,11 +151,7 @@ def get_file_data_from_writer(writer_obj):
 	stream = io.BytesIO()
 	writer_obj.write(stream)
 
-	# Change the stream position to start of the stream
-	stream.seek(0)
-
-	# Read up to size bytes from the object and return them
-	return stream.read()
+	return stream.getvalue()
 
 
 def prepare_options(html, options):
@@ -196,7 +208,9 @@ def get_cookie_options():
 		# Remove port from request.host
 		# https://werkzeug.palletsprojects.com/en/0.16.x/wrappers/#werkzeug.wrappers.BaseRequest.host
 		domain = frappe.utils.get_host_name().split(":", 1)[0]
-		with open(cookiejar, "w") as f:
+		# the jar holds a live session id, keep it readable by this user only
+		fd = os.open(cookiejar, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+		with os.fdopen(fd, "w") as f:
 			f.write(f"sid={frappe.session.sid}; Domain={domain};\n")
 
 		options["cookie-jar"] = cookiejar
@@ -213,19 +227,12 @@ def read_options_from_html(html):
 	toggle_visible_pdf(soup)
 
 	# use regex instead of soup-parser
-	for attr in (
-		"margin-top",
-		"margin-bottom",
-		"margin-left",
-		"margin-right",
-		"page-size",
-		"header-spacing",
-		"orientation",
-		"page-width",
-		"page-height",
-	):
+	for attr, pattern in PDF_OPTION_PATTERNS.items():
+		# plain substring check first, most attributes aren't set by the print format at all
+		if f"{attr}:" not in html:
+			continue
+
 		try:
-			pattern = re.compile(r"(\.print-format)([\S|\s][^}]*?)(" + str(attr) + r":)(.+)(mm;)")
 			match = pattern.findall(html)
 			if match:
 				options[attr] = str(match[-1][3]).strip()
@@ -242,7 +249,7 @@ def prepare_header_footer(soup):
 	styles = soup.find_all("style")
 
 	print_css = bundled_asset("print.bundle.css").lstrip("/")
-	css = frappe.read_file(os.path.join(frappe.local.sites_path, print_css))
+	css = get_print_css(os.path.join(frappe.local.sites_path, print_css))
 
 	# extract header and footer
 	for html_id in ("header-html", "footer-html"):
@@ -280,6 +287,22 @@ def prepare_header_footer(soup):
 	return options
 
 
+def get_print_css(path):
+	"""Read the print css bundle, cached until the file changes on the next asset build."""
+	try:
+		mtime = os.path.getmtime(path)
+	except OSError:
+		return None
+
+	cached = _print_css_cache.get(path)
+	if cached and cached[0] == mtime:
+		return cached[1]
+
+	css = frappe.read_file(path)
+	_print_css_cache[path] = (mtime, css)
+	return css
+
+
 def cleanup(options):
 	for key in ("header-html", "footer-html", "cookie-jar"):
 		if options.get(key) and os.path.exists(options[key]):
@@ -297,6 +320,12 @@ def toggle_visible_pdf(soup):
 
 
 def get_wkhtmltopdf_version():
+	global _wkhtmltopdf_version
+
+	# the binary doesn't change under a running process, skip the redis lookup once known
+	if _wkhtmltopdf_version:
+		return _wkhtmltopdf_version
+
 	wkhtmltopdf_version = frappe.cache.hget("wkhtmltopdf_version", None)
 
 	if not wkhtmltopdf_version:
@@ -307,4 +336,5 @@ def get_wkhtmltopdf_version():
 		except Exception:
 			pass
 
+	_wkhtmltopdf_version = wkhtmltopdf_version
 	return wkhtmltopdf_version or "0"
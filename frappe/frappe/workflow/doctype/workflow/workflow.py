@@ -67,22 +67,31 @@ class Workflow(Document):
 
 	def update_default_workflow_status(self):
 		docstatus_map = {}
-		states = self.get("states")
-		for d in states:
-			if not d.doc_status in docstatus_map:
-				frappe.db.sql(
-					"""
-					UPDATE `tab{doctype}`
-					SET `{field}` = %s
-					WHERE ifnull(`{field}`, '') = ''
-					AND `docstatus` = %s
-				""".format(
-						doctype=self.document_type, field=self.workflow_state_field
-					),
-					(d.state, d.doc_status),
-				)
-
-				docstatus_map[d.doc_status] = d.state
+		for d in self.get("states"):
+			docstatus_map.setdefault(d.doc_status, d.state)
+
+		if not docstatus_map:
+			return
+
+		cases, values = [], []
+		for docstatus, state in docstatus_map.items():
+			cases.append("WHEN %s THEN %s")
+			values.extend((docstatus, state))
+
+		frappe.db.sql(
+			"""
+			UPDATE `tab{doctype}`
+			SET `{field}` = CASE `docstatus` {cases} END
+			WHERE ifnull(`{field}`, '') = ''
+			AND `docstatus` IN ({docstatuses})
+		""".format(
+				doctype=self.document_type,
+				field=self.workflow_state_field,
+				cases=" ".join(cases),
+				docstatuses=", ".join(["%s"] * len(docstatus_map)),
+			),
+			(*values, *docstatus_map),
+		)
 
 	def update_doc_status(self):
 		"""
@@ -90,29 +99,27 @@ class Workflow(Document):
 		If yes then the docstatus of the document with same state will be updated
 		"""
 		doc_before_save = self.get_doc_before_save()
-		before_save_states, new_states = {}, {}
 		if doc_before_save:
-			for d in doc_before_save.states:
-				before_save_states[d.state] = d
+			before_save_docstatus = {d.state: d.doc_status for d in doc_before_save.states}
+
 			for d in self.states:
-				new_states[d.state] = d
-
-			for key in new_states:
-				if key in before_save_states:
-					if not new_states[key].doc_status == before_save_states[key].doc_status:
-						frappe.db.set_value(
-							self.document_type,
-							{self.workflow_state_field: before_save_states[key].state},
-							"docstatus",
-							new_states[key].doc_status,
-							update_modified=False,
-						)
+				if before_save_docstatus.get(d.state, d.doc_status) != d.doc_status:
+					frappe.db.set_value(
+						self.document_type,
+						{self.workflow_state_field: d.state},
+						"docstatus",
+						d.doc_status,
+						update_modified=False,
+					)
 
 	def validate_docstatus(self):
+		states_by_name = {}
+		for s in self.states:
+			states_by_name.setdefault(s.state, s)
+
 		def get_state(state):
-			for s in self.states:
-				if s.state == state:
-					return s
+			if state_row := states_by_name.get(state):
+				return state_row
 
 			frappe.throw(frappe._("{0} not a valid State").format(state))
 
@@ -136,12 +143,14 @@ class Workflow(Document):
 				frappe.throw(frappe._("Cannot cancel before submitting. See Transition {0}").format(t.idx))
 
 	def set_active(self):
-		if int(self.is_active or 0):
+		if int(self.is_active or 0) and frappe.db.exists(
+			"Workflow", {"document_type": self.document_type, "is_active": 1, "name": ("!=", self.name)}
+		):
 			# clear all other
 			frappe.db.sql(
 				"""UPDATE `tabWorkflow` SET `is_active`=0
-				WHERE `document_type`=%s""",
-				self.document_type,
+				WHERE `document_type`=%s AND `is_active`=1 AND `name`!=%s""",
+				(self.document_type, self.name),
 			)
 
 
@@ -870,6 +870,16 @@ def get_leave_balance_on(
 
 def get_leave_allocation_records(employee, date, leave_type=None):
 	"""Returns the total allocated leaves and carry forwarded leaves based on ledger entries"""
+	return get_leave_allocation_records_for_employees([employee], date, leave_type).get(
+		employee, frappe._dict()
+	)
+
+
+def get_leave_allocation_records_for_employees(employees, date, leave_type=None):
+	"""Returns {employee: {leave_type: allocation details}} for all given employees in one query"""
+	if not employees:
+		return frappe._dict()
+
 	Ledger = frappe.qb.DocType("Leave Ledger Entry")
 	LeaveAllocation = frappe.qb.DocType("Leave Allocation")
 
@@ -899,7 +909,7 @@ def get_leave_allocation_records(employee, date, leave_type=None):
 			(Ledger.from_date <= date)
 			& (Ledger.docstatus == 1)
 			& (Ledger.transaction_type == "Leave Allocation")
-			& (Ledger.employee == employee)
+			& (Ledger.employee.isin(employees))
 			& (Ledger.is_expired == 0)
 			& (Ledger.is_lwp == 0)
 			& (
@@ -926,7 +936,7 @@ def get_leave_allocation_records(employee, date, leave_type=None):
 
 	allocated_leaves = frappe._dict()
 	for d in allocation_details:
-		allocated_leaves.setdefault(
+		allocated_leaves.setdefault(d.employee, frappe._dict()).setdefault(
 			d.leave_type,
 			frappe._dict(
 				{
@@ -10,6 +10,7 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.query_builder import Criterion
 from frappe.utils import add_days, cstr, get_link_to_form, get_time, getdate, now_datetime
+from frappe.utils.caching import request_cache
 
 from hrms.hr.utils import validate_active_employee
 from hrms.utils import generate_date_range
@@ -51,30 +52,10 @@ class ShiftAssignment(Document):
 			)
 		)
 
+		# assignments overlap when each one starts before the other ends
+		query = query.where(shift.end_date.isnull() | (shift.end_date >= self.start_date))
 		if self.end_date:
-			query = query.where(
-				Criterion.any(
-					[
-						Criterion.any(
-							[
-								shift.end_date.isnull(),
-								((self.start_date >= shift.start_date) & (self.start_date <= shift.end_date)),
-							]
-						),
-						Criterion.any(
-							[
-								((self.end_date >= shift.start_date) & (self.end_date <= shift.end_date)),
-								shift.start_date.between(self.start_date, self.end_date),
-							]
-						),
-					]
-				)
-			)
-		else:
-			query = query.where(
-				shift.end_date.isnull()
-				| ((self.start_date >= shift.start_date) & (self.start_date <= shift.end_date))
-			)
+			query = query.where(shift.start_date <= self.end_date)
 
 		return query.run(as_dict=True)
 
@@ -98,22 +79,17 @@ def has_overlapping_timings(shift_1: str, shift_2: str) -> bool:
 	if shift_1 == shift_2:
 		return True
 
-	s1 = frappe.db.get_value("Shift Type", shift_1, ["start_time", "end_time"], as_dict=True)
-	s2 = frappe.db.get_value("Shift Type", shift_2, ["start_time", "end_time"], as_dict=True)
-
-	if (
-		# shift 1 spans across 2 days
-		(s1.start_time > s1.end_time and s1.start_time < s2.end_time)
-		or (s1.start_time > s1.end_time and s2.start_time < s1.end_time)
-		or (s1.start_time > s1.end_time and s2.start_time > s2.end_time)
-		# both shifts fall on the same day
-		or (s1.start_time < s2.end_time and s2.start_time < s1.end_time)
-		# shift 2 spans across 2 days
-		or (s1.start_time < s2.end_time and s2.start_time > s2.end_time)
-		or (s2.start_time < s1.end_time and s2.start_time > s2.end_time)
-	):
-		return True
-	return False
+	s1 = _get_shift_intervals(get_shift_type(shift_1))
+	s2 = _get_shift_intervals(get_shift_type(shift_2))
+
+	return any(a_start < b_end and b_start < a_end for a_start, a_end in s1 for b_start, b_end in s2)
+
+
+def _get_shift_intervals(shift_type: dict) -> List[tuple]:
+	"""Returns the shift's timings as intervals within a day, splitting shifts that span midnight"""
+	if shift_type.start_time > shift_type.end_time:
+		return [(shift_type.start_time, timedelta(days=1)), (timedelta(0), shift_type.end_time)]
+	return [(shift_type.start_time, shift_type.end_time)]
 
 
 @frappe.whitelist()
@@ -154,19 +130,16 @@ def add_assignments(start, end, filters):
 	)
 
 	shift_timing_map = get_shift_type_timing([d.shift_type for d in records])
+	seen = set()
 
 	for d in records:
-		daily_event_start = d.start_date
+		first_day_start = datetime.combine(d.start_date, datetime.min.time())
 		daily_event_end = d.end_date if d.end_date else getdate()
-		delta = timedelta(days=1)
-		while daily_event_start <= daily_event_end:
-			start_timing = (
-				frappe.utils.get_datetime(daily_event_start) + shift_timing_map[d.shift_type]["start_time"]
-			)
-			end_timing = (
-				frappe.utils.get_datetime(daily_event_start) + shift_timing_map[d.shift_type]["end_time"]
-			)
-			daily_event_start += delta
+		timing = shift_timing_map[d.shift_type]
+		for day in range((daily_event_end - d.start_date).days + 1):
+			day_start = first_day_start + timedelta(days=day)
+			start_timing = day_start + timing["start_time"]
+			end_timing = day_start + timing["end_time"]
 			e = {
 				"name": d.name,
 				"doctype": "Shift Assignment",
@@ -177,7 +150,8 @@ def add_assignments(start, end, filters):
 				"allDay": 0,
 				"convertToUserTz": 0,
 			}
-			if e not in events:
+			if (d.name, start_timing) not in seen:
+				seen.add((d.name, start_timing))
 				events.append(e)
 
 	return events
@@ -310,9 +284,16 @@ def _adjust_overlapping_shifts(shifts: dict):
 def get_shifts_for_date(employee: str, for_timestamp: datetime) -> List[Dict[str, str]]:
 	"""Returns list of shifts with details for given date"""
 	for_date = for_timestamp.date()
-	prev_day = add_days(for_date, -1)
-	next_day = add_days(for_date, 1)
+	# for shifts that exceed a day in duration or margins
+	# eg: shift = 00:30:00 - 10:00:00, including margins (1 hr) = 23:30:00 - 11:00:00
+	# if for_timestamp = 23:30:00 (falls in before shift margin), also fetch next days shift to find the correct shift
+	# eg: shift = 15:00 - 23:30, including margins (1 hr) = 14:00 - 00:30
+	# if for_timestamp = 00:30:00 (falls in after shift margin), also fetch prev days shift to find the correct shift
+	return get_shift_assignments_between(employee, add_days(for_date, -1), add_days(for_date, 1))
+
 
+def get_shift_assignments_between(employee: str, from_date, to_date) -> List[Dict[str, str]]:
+	"""Returns active shift assignments of the employee that overlap the given date range"""
 	assignment = frappe.qb.DocType("Shift Assignment")
 	return (
 		frappe.qb.from_(assignment)
@@ -321,21 +302,12 @@ def get_shifts_for_date(employee: str, for_timestamp: datetime) -> List[Dict[str
 			(assignment.employee == employee)
 			& (assignment.docstatus == 1)
 			& (assignment.status == "Active")
-			# for shifts that exceed a day in duration or margins
-			# eg: shift = 00:30:00 - 10:00:00, including margins (1 hr) = 23:30:00 - 11:00:00
-			# if for_timestamp = 23:30:00 (falls in before shift margin), also fetch next days shift to find the correct shift
-			& (assignment.start_date <= next_day)
+			& (assignment.start_date <= to_date)
 			& (
 				Criterion.any(
 					[
 						assignment.end_date.isnull(),
-						(
-							assignment.end_date.isnotnull()
-							# for shifts that exceed a day in duration or margins
-							# eg: shift = 15:00 - 23:30, including margins (1 hr) = 14:00 - 00:30
-							# if for_timestamp = 00:30:00 (falls in after shift margin), also fetch prev days shift to find the correct shift
-							& (prev_day <= assignment.end_date)
-						),
+						(assignment.end_date.isnotnull() & (from_date <= assignment.end_date)),
 					]
 				)
 			)
@@ -355,6 +327,7 @@ def get_employee_shift(
 	for_timestamp: datetime = None,
 	consider_default_shift: bool = False,
 	next_shift_direction: str = None,
+	default_shift: str = None,
 ) -> Dict:
 	"""Returns a Shift Type for the given employee on the given date
 
@@ -362,6 +335,7 @@ def get_employee_shift(
 	:param for_timestamp: DateTime on which shift is required
 	:param consider_default_shift: If set to true, default shift is taken when no shift assignment is found.
 	:param next_shift_direction: One of: None, 'forward', 'reverse'. Direction to look for next shift if shift not found on given date.
+	:param default_shift: Employee's default shift, fetched from the Employee if not passed.
 	"""
 	if for_timestamp is None:
 		for_timestamp = now_datetime()
@@ -369,7 +343,8 @@ def get_employee_shift(
 	shift_details = get_shift_for_timestamp(employee, for_timestamp)
 
 	# if shift assignment is not found, consider default shift
-	default_shift = frappe.db.get_value("Employee", employee, "default_shift", cache=True)
+	if default_shift is None:
+		default_shift = frappe.db.get_value("Employee", employee, "default_shift", cache=True)
 	if not shift_details and consider_default_shift:
 		shift_details = get_shift_details(default_shift, for_timestamp)
 
@@ -397,7 +372,7 @@ def get_prev_or_next_shift(
 		direction = -1 if next_shift_direction == "reverse" else 1
 		for i in range(MAX_DAYS):
 			date = for_timestamp + timedelta(days=direction * (i + 1))
-			shift_details = get_employee_shift(employee, date, consider_default_shift, None)
+			shift_details = get_employee_shift(employee, date, consider_default_shift, None, default_shift)
 			if shift_details:
 				return shift_details
 	else:
@@ -417,15 +392,34 @@ def get_prev_or_next_shift(
 			order_by="start_date " + sort_order,
 		)
 
-		for date_range in shift_dates:
-			# midnight shifts will span more than a day
-			start_date, end_date = date_range[0], add_days(date_range[1], 1)
-			reverse = next_shift_direction == "reverse"
+		if not shift_dates:
+			return {}
+
+		# midnight shifts will span more than a day
+		date_ranges = [
+			(start_date, getdate(add_days(end_date, 1))) for start_date, end_date in shift_dates
+		]
+		reverse = next_shift_direction == "reverse"
 
+		# fetch every assignment that get_shifts_for_date could return for the dates below at once
+		assignments = get_shift_assignments_between(
+			employee,
+			add_days(min(start_date for start_date, _ in date_ranges), -1),
+			add_days(max(end_date for _, end_date in date_ranges), 1),
+		)
+
+		for start_date, end_date in date_ranges:
 			for dt in generate_date_range(start_date, end_date, reverse=reverse):
-				shift_details = get_employee_shift(
-					employee, datetime.combine(dt, for_timestamp.time()), consider_default_shift, None
-				)
+				prev_day, next_day = add_days(dt, -1), add_days(dt, 1)
+				shifts = [
+					d
+					for d in assignments
+					if d.start_date <= next_day and (not d.end_date or prev_day <= d.end_date)
+				]
+				if not shifts:
+					continue
+
+				shift_details = get_shift_for_time(shifts, datetime.combine(dt, for_timestamp.time()))
 				if shift_details:
 					return shift_details
 
@@ -439,21 +433,27 @@ def get_employee_shift_timings(
 	if for_timestamp is None:
 		for_timestamp = now_datetime()
 
+	default_shift = frappe.db.get_value("Employee", employee, "default_shift", cache=True)
+
 	# write and verify a test case for midnight shift.
 	prev_shift = curr_shift = next_shift = None
-	curr_shift = get_employee_shift(employee, for_timestamp, consider_default_shift, "forward")
+	curr_shift = get_employee_shift(
+		employee, for_timestamp, consider_default_shift, "forward", default_shift
+	)
 	if curr_shift:
 		next_shift = get_employee_shift(
 			employee,
 			curr_shift.start_datetime + timedelta(days=1),
 			consider_default_shift,
 			"forward",
+			default_shift,
 		)
 	prev_shift = get_employee_shift(
 		employee,
 		(curr_shift.end_datetime if curr_shift else for_timestamp) + timedelta(days=-1),
 		consider_default_shift,
 		"reverse",
+		default_shift,
 	)
 
 	if curr_shift:
@@ -551,6 +551,7 @@ def get_shift_details(shift_type_name: str, for_timestamp: datetime = None) -> D
 	)
 
 
+@request_cache
 def get_shift_type(shift_type_name: str) -> dict:
 	return frappe.get_cached_value(
 		"Shift Type",
@@ -566,6 +567,12 @@ def get_shift_type(shift_type_name: str) -> dict:
 	)
 
 
+def clear_shift_type_cache():
+	"""Drops shift types memoized by `get_shift_type` for the current request"""
+	if cache := getattr(frappe.local, "request_cache", None):
+		cache.pop(get_shift_type.__wrapped__, None)
+
+
 def get_shift_timings(shift_type: dict, for_timestamp: datetime) -> tuple:
 	start_time = shift_type.start_time
 	end_time = shift_type.end_time
@@ -622,3 +629,9 @@ def get_shift_timings(shift_type: dict, for_timestamp: datetime) -> tuple:
 		end_datetime = datetime.combine(for_timestamp, datetime.min.time()) + end_time
 
 	return start_datetime, end_datetime
+
+
+def on_doctype_update():
+	frappe.db.add_index(
+		"Shift Assignment", ["employee", "docstatus", "status", "start_date", "end_date"]
+	)
@@ -122,6 +122,34 @@ class TestShiftAssignment(FrappeTestCase):
 		)
 		self.assertRaises(OverlappingShiftError, shift2.insert)
 
+	def test_no_overlap_with_ongoing_shift_starting_after_fixed_period(self):
+		employee = make_employee("test_shift_assignment@example.com", company="_Test Company")
+		shift_type = setup_shift_type(shift_type="Day Shift")
+		date = getdate()
+
+		# ongoing shift starting after the fixed period ends
+		make_shift_assignment(shift_type.name, employee, add_days(date, 31))
+
+		# fixed period shift with the same timings, ending before the ongoing one starts
+		assignment = make_shift_assignment(
+			shift_type.name, employee, date, add_days(date, 30), do_not_submit=True
+		)
+		assignment.insert()
+		assignment.submit()
+		self.assertEqual(assignment.docstatus, 1)
+
+	def test_overlapping_for_ongoing_shift_and_later_fixed_period_shift(self):
+		employee = make_employee("test_shift_assignment@example.com", company="_Test Company")
+		shift_type = setup_shift_type(shift_type="Day Shift")
+		date = getdate()
+
+		# fixed period shift starting after the ongoing shift
+		make_shift_assignment(shift_type.name, employee, add_days(date, 10), add_days(date, 20))
+
+		# ongoing shift without end date overlaps the later fixed period
+		assignment = make_shift_assignment(shift_type.name, employee, date, do_not_submit=True)
+		self.assertRaises(OverlappingShiftError, assignment.insert)
+
 	def test_overlap_for_shifts_on_same_day_with_overlapping_timeslots(self):
 		employee = make_employee("test_shift_assignment@example.com", company="_Test Company")
 
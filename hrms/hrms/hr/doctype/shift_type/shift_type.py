@@ -17,7 +17,11 @@ from hrms.hr.doctype.employee_checkin.employee_checkin import (
 	calculate_working_hours,
 	mark_attendance_and_link_log,
 )
-from hrms.hr.doctype.shift_assignment.shift_assignment import get_employee_shift, get_shift_details
+from hrms.hr.doctype.shift_assignment.shift_assignment import (
+	clear_shift_type_cache,
+	get_employee_shift,
+	get_shift_details,
+)
 from hrms.utils import get_date_range
 from hrms.utils.holiday_list import get_holiday_dates_between
 
@@ -25,6 +29,12 @@ EMPLOYEE_CHUNK_SIZE = 50
 
 
 class ShiftType(Document):
+	def on_update(self):
+		clear_shift_type_cache()
+
+	def on_trash(self):
+		clear_shift_type_cache()
+
 	@frappe.whitelist()
 	def process_auto_attendance(self):
 		if (
@@ -148,10 +158,11 @@ class ShiftType(Document):
 		"""
 		start_time = get_time(self.start_time)
 		dates = self.get_dates_for_attendance(employee)
+		default_shift = frappe.db.get_value("Employee", employee, "default_shift", cache=True)
 
 		for date in dates:
 			timestamp = datetime.combine(date, start_time)
-			shift_details = get_employee_shift(employee, timestamp, True)
+			shift_details = get_employee_shift(employee, timestamp, True, default_shift=default_shift)
 
 			if shift_details and shift_details.shift_type.name == self.name:
 				attendance = mark_attendance(employee, date, "Absent", self.name)
@@ -4,8 +4,12 @@
 
 import frappe
 from frappe import _
+from frappe.utils import cint, flt
 
-from hrms.hr.doctype.leave_application.leave_application import get_leave_details
+from hrms.hr.doctype.leave_application.leave_application import (
+	get_leave_allocation_records_for_employees,
+	get_leave_balance_on,
+)
 
 
 def execute(filters=None):
@@ -54,15 +58,30 @@ def get_data(filters, leave_types):
 		fields=["name", "employee_name", "department", "user_id"],
 	)
 
+	# allocations of all employees in one query, balances are only computed where there is one
+	allocation_records = get_leave_allocation_records_for_employees(
+		[employee.name for employee in active_employees], filters.date
+	)
+	precision = cint(frappe.db.get_single_value("System Settings", "float_precision", cache=True))
+
 	data = []
 	for employee in active_employees:
 		row = [employee.name, employee.employee_name, employee.department]
-		available_leave = get_leave_details(employee.name, filters.date)
+		allocations = allocation_records.get(employee.name, {})
 		for leave_type in leave_types:
 			remaining = 0
-			if leave_type in available_leave["leave_allocation"]:
+			if allocation := allocations.get(leave_type):
 				# opening balance
-				remaining = available_leave["leave_allocation"][leave_type]["remaining_leaves"]
+				remaining = flt(
+					get_leave_balance_on(
+						employee.name,
+						leave_type,
+						filters.date,
+						to_date=allocation.to_date,
+						consider_all_leaves_in_the_allocation_period=True,
+					),
+					precision,
+				)
 
 			row += [remaining]
 